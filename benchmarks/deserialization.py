@@ -0,0 +1,95 @@
+"""
+Compare the generated per-model deserializer with the generic from_resource path.
+
+    python benchmarks/deserialization.py [page_size]
+"""
+
+import os
+import sys
+import timeit
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+settings.configure(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+django.setup()
+
+from json_decoders import make_page  # noqa: E402
+
+from django_json_api import fields, models  # noqa: E402
+
+
+class Company(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://example.com/api/"
+        resource_type = "companies"
+
+    name = fields.Attribute()
+    domain = fields.Attribute()
+    created_at = fields.DateTimeAttribute()
+    settings = fields.Attribute()
+    owner = fields.Relationship()
+    members = fields.Relationship(many=True)
+
+
+class LazyCompany(Company):
+    class Meta:
+        api_url = "http://example.com/api/"
+        resource_type = "lazy_companies"
+        lazy_attributes = True
+
+
+def generic_from_resource(resource_dict, existing_cache=None):
+    # The path from_resource took before deserializers were generated per model
+    cls = Company
+    kwargs = {}
+    data = {
+        **resource_dict.get("attributes", {}),
+        **{
+            name: value["data"]
+            for name, value in resource_dict.get("relationships", {}).items()
+            if "data" in value
+        },
+    }
+    for name, field in cls._meta.fields.items():
+        try:
+            kwargs[name] = field.clean(data[name])
+        except KeyError:
+            if existing_cache and hasattr(existing_cache, f"{name}_identifiers"):
+                kwargs[name] = getattr(existing_cache, f"{name}_identifiers")
+            elif existing_cache and hasattr(existing_cache, f"{name}_identifier"):
+                kwargs[name] = getattr(existing_cache, f"{name}_identifier")
+    return cls(id=resource_dict["id"], **kwargs)
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    resources = make_page(page_size)["data"]
+    deserialize = Company._meta.deserialize
+    for resource in resources:
+        assert deserialize(resource).__dict__ == generic_from_resource(resource).__dict__
+    print(f"Deserializing {page_size} resources")
+    baseline = None
+    for label, function in [
+        ("generic from_resource", generic_from_resource),
+        ("generated deserializer", deserialize),
+        ("generated deserializer, lazy attributes", LazyCompany._meta.deserialize),
+    ]:
+        runs = 20
+        elapsed = (
+            min(
+                timeit.repeat(
+                    lambda: [function(resource) for resource in resources], number=runs, repeat=5
+                )
+            )
+            / runs
+        )
+        baseline = baseline or elapsed
+        print(f"{label:<40} {elapsed * 1000:8.2f} ms  x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
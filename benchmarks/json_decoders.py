@@ -0,0 +1,68 @@
+"""
+Compare JSON decoders on a JSON:API page, as used through DJANGO_JSON_API_JSON_DECODER.
+
+    python benchmarks/json_decoders.py [page_size]
+"""
+
+import json
+import sys
+import timeit
+from importlib import import_module
+
+DECODERS = ["json.loads", "orjson.loads", "ujson.loads", "simdjson.loads"]
+
+
+def make_page(page_size):
+    return {
+        "data": [
+            {
+                "id": str(i),
+                "type": "companies",
+                "attributes": {
+                    "name": f"Company #{i}",
+                    "domain": f"company-{i}.example.com",
+                    "created_at": "2021-02-24T12:34:56.789000+00:00",
+                    "settings": {"locale": "fr-FR", "seats": i, "features": ["a", "b", "c"]},
+                },
+                "relationships": {
+                    "owner": {"data": {"id": str(i * 7), "type": "users"}},
+                    "members": {"data": [{"id": str(j), "type": "users"} for j in range(5)]},
+                },
+            }
+            for i in range(page_size)
+        ],
+        "links": {"next": "http://example.com/api/companies/?page%5Bnumber%5D=2"},
+        "meta": {"record_count": page_size * 10},
+    }
+
+
+def load(path):
+    module_name, _, name = path.rpartition(".")
+    try:
+        return getattr(import_module(module_name), name)
+    except ImportError:
+        return None
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    content = json.dumps(make_page(page_size)).encode()
+    print(f"Decoding a {page_size} resources page ({len(content) / 1024:.0f} KiB)")
+    baseline = None
+    for path in ["requests (str decode + json.loads)"] + DECODERS:
+        if path.startswith("requests"):
+            decoder = lambda raw: json.loads(raw.decode("utf-8"))  # noqa: E731
+        else:
+            decoder = load(path)
+        if decoder is None:
+            print(f"{path:<40} not installed")
+            continue
+        assert decoder(content)["meta"]["record_count"] == page_size * 10
+        runs = 20
+        elapsed = min(timeit.repeat(lambda: decoder(content), number=runs, repeat=5)) / runs
+        baseline = baseline or elapsed
+        print(f"{path:<40} {elapsed * 1000:8.2f} ms  x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare the memory held by deserialized records with and without `Meta.compact`.
+
+    python benchmarks/memory.py [count]
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+settings.configure(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+django.setup()
+
+from json_decoders import make_page  # noqa: E402
+
+from django_json_api import fields, models  # noqa: E402
+
+
+class Company(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://example.com/api/"
+        resource_type = "companies"
+
+    name = fields.Attribute()
+    domain = fields.Attribute()
+    created_at = fields.DateTimeAttribute()
+    settings = fields.Attribute()
+    owner = fields.Relationship()
+    members = fields.Relationship(many=True)
+
+
+class CompactCompany(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://example.com/api/"
+        resource_type = "compact_companies"
+        compact = True
+
+    name = fields.Attribute()
+    domain = fields.Attribute()
+    created_at = fields.DateTimeAttribute()
+    settings = fields.Attribute()
+    owner = fields.Relationship()
+    members = fields.Relationship(many=True)
+
+
+def measure(model, count):
+    # Documents are dropped once deserialized, only what records retain is counted
+    deserialize = model._meta.deserialize
+    gc.collect()
+    tracemalloc.start()
+    records = [deserialize(resource) for resource in make_page(count)["data"]]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, records
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"Holding {count} records")
+    baseline = None
+    expected = None
+    for label, model in [("__dict__ storage", Company), ("compact storage", CompactCompany)]:
+        size, records = measure(model, count)
+        state = [record._get_state() for record in records[:10]]
+        assert expected is None or state == expected
+        expected = state
+        baseline = baseline or size
+        print(
+            f"{label:<20} {size / 1024 / 1024:8.2f} MiB  {size / count:6.0f} B/record"
+            f"  x{baseline / size:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
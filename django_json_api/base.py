@@ -1,3 +1,6 @@
+from django_json_api import registry
+from django_json_api.deserializer import build_deserializer, build_relationships_check
+from django_json_api.fields import get_compact_slots, make_compact
 from django_json_api.manager import JSONAPIManager
 
 
@@ -14,6 +17,7 @@ class JSONAPIModelBase(type):
         if not parents:
             return super_new(cls, name, bases, attrs)
         meta = attrs.pop("Meta")
+        abstract = vars(meta).get("abstract", False)
         new_attrs = {}
         contributable_attrs = {}
         for obj_name, obj in list(attrs.items()):
@@ -21,17 +25,51 @@ class JSONAPIModelBase(type):
                 contributable_attrs[obj_name] = obj
             else:
                 new_attrs[obj_name] = obj
+        fields = {}
+        for parent in reversed(parents):
+            if hasattr(parent, "_meta"):
+                fields.update(parent._meta.fields)
+        compact = getattr(meta, "compact", False) or any(
+            getattr(parent._meta, "compact", False)
+            for parent in parents
+            if hasattr(parent, "_meta")
+        )
+        if compact and "__slots__" not in new_attrs:
+            inherited = {
+                slot
+                for base in bases
+                for klass in base.__mro__
+                for slot in vars(klass).get("__slots__", ())
+            }
+            new_attrs["__slots__"] = tuple(
+                slot
+                for slot in get_compact_slots({**fields, **contributable_attrs})
+                if slot not in inherited
+            )
+        elif abstract:
+            # Keeps instance dicts off the subclasses of abstract models that are compact
+            new_attrs.setdefault("__slots__", ())
         new_class = super_new(cls, name, bases, new_attrs, **kwargs)
         new_class._meta = meta
         new_class._meta.model = new_class
-        new_class._meta.fields = {}
+        new_class._meta.abstract = abstract
+        new_class._meta.compact = compact
+        new_class._meta.fields = fields
+
+        for obj_name, obj in contributable_attrs.items():
+            new_class._meta.fields[obj_name] = obj.contribute_to_class(new_class, obj_name)
+        if compact:
+            make_compact(new_class)
+        if abstract:
+            new_class.Meta = meta
+            return new_class
 
         class JSONAPIMeta:
             resource_name = new_class._meta.resource_type
 
         new_class.JSONAPIMeta = JSONAPIMeta
-
-        for obj_name, obj in contributable_attrs.items():
-            new_class._meta.fields[obj_name] = obj.contribute_to_class(new_class, obj_name)
+        new_class._meta.deserialize = build_deserializer(new_class)
+        new_class._meta.lacks_relationships = build_relationships_check(new_class)
         new_class.objects = JSONAPIManager(new_class)
+        registry.register(new_class)
         return new_class
@@ -0,0 +1,312 @@
+import asyncio
+import math
+import pickle
+import random
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from django_json_api.fields import RAW_ATTRIBUTES, Relationship
+
+
+class LocalCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.size,
+        }
+
+    def _delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        payloads = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] <= now:
+                    self._delete(key)
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                payloads[key] = entry[1]
+        # Values are stored pickled so that callers never share mutable instances
+        return {key: pickle.loads(payload) for key, payload in payloads.items()}
+
+    def set_many(self, values: Dict[str, Any], timeout: float) -> None:
+        payloads = {
+            key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL) for key, value in values.items()
+        }
+        expires_at = time.monotonic() + timeout
+        with self._lock:
+            for key, payload in payloads.items():
+                self._delete(key)
+                if len(payload) <= self.max_bytes:
+                    self._entries[key] = (expires_at, payload)
+                    self.size += len(payload)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._delete(next(iter(self._entries)))
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_local_cache: Optional[LocalCache] = None
+_local_cache_lock = Lock()
+
+
+def get_local_cache() -> LocalCache:
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                _local_cache = LocalCache(
+                    max_entries=getattr(settings, "DJANGO_JSON_API_LOCAL_CACHE_MAX_ENTRIES", 1000),
+                    max_bytes=getattr(
+                        settings, "DJANGO_JSON_API_LOCAL_CACHE_MAX_BYTES", 16 * 1024 * 1024
+                    ),
+                )
+    return _local_cache
+
+
+# Stored in place of records the upstream does not know about
+NOT_FOUND = "jsonapi:not-found"
+
+# Bump whenever the layout produced by `encode_record` changes
+CACHE_FORMAT_VERSION = 1
+
+_schemas: Dict[type, int] = {}
+
+
+def get_schema(model) -> int:
+    schema = _schemas.get(model)
+    if schema is None:
+        description = [CACHE_FORMAT_VERSION, getattr(model._meta, "cache_version", None)]
+        description.extend(
+            (name, type(field).__name__, getattr(field, "many", False))
+            for name, field in model._meta.fields.items()
+        )
+        schema = _schemas[model] = zlib.crc32(repr(description).encode())
+    return schema
+
+
+def _encode_value(record, state: dict, name: str, field) -> Any:
+    # Ellipsis marks values absent from the record, which is not the same as `None` for
+    # relationships: absent identifiers are fetched again when the relationship is resolved
+    if not isinstance(field, Relationship):
+        if field.name in state or field.name in (state.get(RAW_ATTRIBUTES) or ()):
+            return getattr(record, name)
+        return ...
+    key = f"{field.name}_identifiers" if field.many else f"{field.name}_identifier"
+    value = getattr(record, key, ...)
+    if value is None or value is ...:
+        return value
+    if field.many:
+        return [(identifier["type"], identifier["id"]) for identifier in value]
+    return value["type"], value["id"]
+
+
+def _decode_value(field, value: Any) -> Any:
+    if not isinstance(field, Relationship) or value is None:
+        return value
+    if field.many:
+        return [{"id": record_id, "type": resource_type} for resource_type, record_id in value]
+    return {"id": value[1], "type": value[0]}
+
+
+def encode_record(record) -> tuple:
+    state = record._get_state()
+    payload = (
+        record.pk,
+        tuple(
+            _encode_value(record, state, name, field) for name, field in record._meta.fields.items()
+        ),
+    )
+    threshold = getattr(settings, "DJANGO_JSON_API_CACHE_COMPRESS_THRESHOLD", None)
+    if threshold is not None:
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        if len(data) > threshold:
+            return get_schema(type(record)), zlib.compress(data)
+    return get_schema(type(record)), payload
+
+
+def decode_record(model, value: Any) -> Any:
+    if not isinstance(value, tuple) or len(value) != 2 or value[0] != get_schema(model):
+        return None
+    payload = value[1]
+    if isinstance(payload, bytes):
+        payload = pickle.loads(zlib.decompress(payload))
+    pk, values = payload
+    return model(
+        pk=pk,
+        **{
+            name: _decode_value(field, field_value)
+            for (name, field), field_value in zip(model._meta.fields.items(), values)
+            if field_value is not ...
+        },
+    )
+
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    fresh_until: float
+    expires_at: Optional[float] = None
+
+    def is_stale(self, now: float, early_expiration: Optional[float] = None) -> bool:
+        if self.fresh_until <= now:
+            return True
+        if not early_expiration or self.expires_at is None:
+            return False
+        # Probabilistic early expiration: the closer to `expires_at`, the likelier a refresh,
+        # so that workers do not all miss at once when a popular record expires
+        return now - early_expiration * math.log(1.0 - random.random()) >= self.expires_at
+
+
+@contextmanager
+def cache_lock(key: str, timeout: Optional[float]) -> Iterator[bool]:
+    if not timeout:
+        yield True
+        return
+    lock_key = f"{key}:lock"
+    acquired = cache.add(lock_key, True, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def wait_for_unlock(key: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while cache.get(f"{key}:lock") is not None and time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+
+
+async def await_unlock(key: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while cache.get(f"{key}:lock") is not None and time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refreshing: Dict[str, Future] = {}
+_refresh_lock = Lock()
+
+
+def schedule_refresh(key: str, refresh: Callable[[], Any]) -> None:
+    global _refresh_executor
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "DJANGO_JSON_API_REFRESH_WORKERS", 2),
+                thread_name_prefix="django-json-api-refresh",
+            )
+        future = _refreshing[key] = _refresh_executor.submit(refresh)
+
+    # A failed refresh leaves the stale record in place until its hard expiration
+    def done(_future: Future) -> None:
+        with _refresh_lock:
+            _refreshing.pop(key, None)
+
+    future.add_done_callback(done)
+
+
+def cache_get_many(model, keys: Iterable[str]) -> Tuple[Dict[str, Any], Set[str]]:
+    keys = list(keys)
+    local_cache_timeout = getattr(model._meta, "local_cache_timeout", None)
+    values = get_local_cache().get_many(keys) if local_cache_timeout else {}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        shared_values = cache.get_many(missing)
+        if local_cache_timeout and shared_values:
+            get_local_cache().set_many(shared_values, local_cache_timeout)
+        values.update(shared_values)
+    now = time.time()
+    early_expiration = getattr(model._meta, "cache_early_expiration", None)
+    stale = set()
+    for key, value in values.items():
+        if isinstance(value, CacheEntry):
+            if value.is_stale(now, early_expiration):
+                stale.add(key)
+            values[key] = value.value
+    if getattr(model._meta, "cache_format", "pickle") == "compact":
+        values = {
+            key: value if value == NOT_FOUND else decode_record(model, value)
+            for key, value in values.items()
+        }
+        # Entries written with another schema are treated as misses
+        values = {key: value for key, value in values.items() if value is not None}
+    else:
+        # So are compact entries left over from a model which switched back to pickling
+        values = {
+            key: value
+            for key, value in values.items()
+            if value == NOT_FOUND or isinstance(value, model)
+        }
+    return values, stale & set(values)
+
+
+def cache_set_many(model, values: Dict[str, Any], timeout: Optional[float]) -> None:
+    if getattr(model._meta, "cache_format", "pickle") == "compact":
+        values = {key: encode_record(record) for key, record in values.items()}
+    cache_soft_expiration = getattr(model._meta, "cache_soft_expiration", None)
+    if cache_soft_expiration or getattr(model._meta, "cache_early_expiration", None):
+        now = time.time()
+        expires_at = now + timeout if timeout is not None else None
+        fresh_until = now + cache_soft_expiration if cache_soft_expiration else math.inf
+        values = {key: CacheEntry(value, fresh_until, expires_at) for key, value in values.items()}
+    _set_many(model, values, timeout)
+
+
+def cache_set_not_found(model, keys: Iterable[str]) -> None:
+    negative_cache_expiration = getattr(model._meta, "negative_cache_expiration", None)
+    if negative_cache_expiration:
+        _set_many(model, dict.fromkeys(keys, NOT_FOUND), negative_cache_expiration)
+
+
+def _set_many(model, values: Dict[str, Any], timeout: Optional[float]) -> None:
+    cache.set_many(values, timeout)
+    local_cache_timeout = getattr(model._meta, "local_cache_timeout", None)
+    if local_cache_timeout:
+        if timeout is not None:
+            local_cache_timeout = min(local_cache_timeout, timeout)
+        get_local_cache().set_many(values, local_cache_timeout)
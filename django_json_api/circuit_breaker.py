@@ -0,0 +1,101 @@
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.dispatch import Signal
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Sent with `api_url`, `previous_state` and `state` keyword arguments
+circuit_breaker_state_changed = Signal()
+
+
+class CircuitBreaker:
+    def __init__(self, api_url: str, failure_threshold: int, reset_timeout: float):
+        self.api_url = api_url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = Lock()
+
+    def _set_state(self, state: str) -> Optional[str]:
+        previous_state, self.state = self.state, state
+        if state != CLOSED:
+            self.opened_at = time.monotonic()
+        return previous_state if previous_state != state else None
+
+    def _notify(self, previous_state: Optional[str]) -> None:
+        if previous_state is not None:
+            circuit_breaker_state_changed.send(
+                sender=self.__class__,
+                api_url=self.api_url,
+                previous_state=previous_state,
+                state=self.state,
+            )
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Let a single trial request through, and another one if it has not ended within
+            # reset_timeout, as its outcome may never be recorded
+            previous_state = self._set_state(HALF_OPEN)
+        self._notify(previous_state)
+        return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            previous_state = self._set_state(CLOSED)
+        self._notify(previous_state)
+
+    def record_abort(self) -> None:
+        # An interrupted request (e.g. a cancelled task) tells nothing about the upstream, but
+        # ends the trial: the next request is let through as a new one
+        with self._lock:
+            previous_state = None
+            if self.state == HALF_OPEN:
+                previous_state = self._set_state(OPEN)
+                self.opened_at -= self.reset_timeout
+        self._notify(previous_state)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            previous_state = None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                previous_state = self._set_state(OPEN)
+        self._notify(previous_state)
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = Lock()
+
+
+def get_circuit_breaker(api_url: str) -> Optional[CircuitBreaker]:
+    failure_threshold = getattr(settings, "DJANGO_JSON_API_CIRCUIT_BREAKER_THRESHOLD", None)
+    if not failure_threshold:
+        return None
+    circuit_breaker = _circuit_breakers.get(api_url)
+    if circuit_breaker is None:
+        with _circuit_breakers_lock:
+            circuit_breaker = _circuit_breakers.get(api_url)
+            if circuit_breaker is None:
+                circuit_breaker = _circuit_breakers[api_url] = CircuitBreaker(
+                    api_url,
+                    failure_threshold,
+                    getattr(settings, "DJANGO_JSON_API_CIRCUIT_BREAKER_RESET_TIMEOUT", 30),
+                )
+    return circuit_breaker
+
+
+def reset_circuit_breakers() -> None:
+    with _circuit_breakers_lock:
+        _circuit_breakers.clear()
@@ -1,17 +1,41 @@
-from typing import Dict, List, Optional, Union
-from urllib.parse import urlencode
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from hashlib import md5
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlencode, urljoin, urlsplit
+from weakref import WeakKeyDictionary
 
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
 
 from django_json_api import __version__
+from django_json_api.circuit_breaker import CircuitBreaker, get_circuit_breaker
 from django_json_api.fields import Relationship, get_model
+from django_json_api.streaming import iter_document
+from django_json_api.transport import get_adapter
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
 
 Fields = Dict[str, List[str]]
 Include = List[str]
 Filters = Dict[str, str]
 ResourceId = Union[str, int]
 Sort = List[str]
+Timeout = Union[None, float, Tuple[Optional[float], Optional[float]]]
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
 
 
 class JSONAPIClientError(Exception):
@@ -20,17 +44,149 @@ class JSONAPIClientError(Exception):
         super().__init__(*args, **kwargs)
 
 
-class JSONAPIClient:
+class JSONAPICircuitOpenError(JSONAPIClientError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _import_json_decoder(path: str) -> Callable[[bytes], Any]:
+    return import_string(path)
+
+
+def get_json_decoder() -> Callable[[bytes], Any]:
+    path = getattr(settings, "DJANGO_JSON_API_JSON_DECODER", None)
+    return _import_json_decoder(path) if path else json.loads
+
+
+class SingleFlight:
+    class Call:
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error = None
+
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "Content-Type": "application/vnd.api+json",
-                "Accept": "application/vnd.api+json",
-                "User-Agent": f"JSONAPIClient/{__version__}",
-                **getattr(settings, "DJANGO_JSON_API_ADDITIONAL_HEADERS", {}),
-            }
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key: str, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self.Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_single_flight = SingleFlight()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def default_headers() -> Dict[str, str]:
+    headers = {
+        "Content-Type": "application/vnd.api+json",
+        "Accept": "application/vnd.api+json",
+        "User-Agent": f"JSONAPIClient/{__version__}",
+    }
+    if not getattr(settings, "DJANGO_JSON_API_KEEP_ALIVE", True):
+        headers["Connection"] = "close"
+    headers.update(getattr(settings, "DJANGO_JSON_API_ADDITIONAL_HEADERS", {}))
+    return headers
+
+
+class BaseJSONAPIClient:
+    # URL building and request policies shared by the sync and async transports
+    def __init__(self, deadline: Optional[float] = None):
+        # Absolute time.monotonic() value after which no request is attempted anymore
+        self.deadline = deadline
+
+    def _check_deadline(self) -> None:
+        if self.deadline is not None and self.deadline <= time.monotonic():
+            raise JSONAPIClientError("Deadline exceeded")
+
+    def _get_timeout(self, resource_type: str) -> Timeout:
+        timeout = getattr(
+            get_model(resource_type)._meta,
+            "timeout",
+            getattr(settings, "DJANGO_JSON_API_TIMEOUT", (5, 30)),
         )
+        if self.deadline is None:
+            return timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise JSONAPIClientError("Deadline exceeded")
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _get_retry_delay(self, resource_type: str, attempt: int, response=None) -> Optional[float]:
+        # Returns how long to wait before the next attempt, or None when giving up
+        retries = getattr(
+            get_model(resource_type)._meta,
+            "retries",
+            getattr(settings, "DJANGO_JSON_API_RETRIES", 0),
+        )
+        if attempt >= retries:
+            return None
+        max_delay = getattr(settings, "DJANGO_JSON_API_RETRY_BACKOFF_MAX", 30)
+        delay = None
+        if response is not None and response.status_code in (429, 503):
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is not None and delay > max_delay:
+                return None
+        if delay is None:
+            backoff = getattr(settings, "DJANGO_JSON_API_RETRY_BACKOFF", 0.1)
+            delay = random.uniform(0, min(max_delay, backoff * 2**attempt))
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            return None
+        return delay
+
+    def _get_circuit_breaker(self, resource_type: str) -> Optional[CircuitBreaker]:
+        circuit_breaker = get_circuit_breaker(get_model(resource_type)._meta.api_url)
+        if circuit_breaker is not None and not circuit_breaker.allow_request():
+            raise JSONAPICircuitOpenError(f"Circuit breaker open for {circuit_breaker.api_url}")
+        return circuit_breaker
+
+    def _record_outcome(self, circuit_breaker: Optional[CircuitBreaker], response=None) -> None:
+        if circuit_breaker is None:
+            return
+        if response is None or response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+
+    def _record_abort(self, circuit_breaker: Optional[CircuitBreaker]) -> None:
+        if circuit_breaker is not None:
+            circuit_breaker.record_abort()
 
     def url_for_resource(self, resource_type: str, resource_id: Optional[ResourceId] = None) -> str:
         model = get_model(resource_type)
@@ -42,6 +198,16 @@ class JSONAPIClient:
             url += f"{resource_id}/"
         return url
 
+    def _resolve_url(self, resource_type: str, url: str) -> str:
+        # URLs given by the server, e.g. links.next, are only followed on the host of the model:
+        # session headers (authentication included) are sent along with every request
+        api_url = urlsplit(get_model(resource_type)._meta.api_url)
+        resolved_url = urljoin(self.url_for_resource(resource_type), url)
+        split_url = urlsplit(resolved_url)
+        if (split_url.scheme, split_url.netloc) != (api_url.scheme, api_url.netloc):
+            raise JSONAPIClientError(f'Refusing to follow "{url}" outside of {api_url.netloc}')
+        return resolved_url
+
     def _get_fields(self, resource_type: str, fields: Optional[Fields] = None) -> Dict[str, str]:
         model = get_model(resource_type)
         fields = fields or {}
@@ -67,7 +233,37 @@ class JSONAPIClient:
             "include": ",".join(include),
         }
 
-    def get(
+    def _document_cache_key(self, resource_type: str, url: str) -> str:
+        return f"jsonapi:document:{resource_type}:{md5(url.encode()).hexdigest()}"
+
+    def _get_stored_document(self, resource_type: str, url: str) -> Optional[Dict]:
+        if not getattr(get_model(resource_type)._meta, "conditional_requests", False):
+            return None
+        return cache.get(self._document_cache_key(resource_type, url))
+
+    def _get_conditional_headers(self, stored: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if stored is not None:
+            if stored["etag"]:
+                headers["If-None-Match"] = stored["etag"]
+            if stored["last_modified"]:
+                headers["If-Modified-Since"] = stored["last_modified"]
+        return headers
+
+    def _store_document(self, resource_type: str, url: str, response) -> None:
+        model = get_model(resource_type)
+        if not getattr(model._meta, "conditional_requests", False):
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            cache.set(
+                self._document_cache_key(resource_type, url),
+                {"etag": etag, "last_modified": last_modified, "content": response.content},
+                timeout=getattr(model._meta, "cache_expiration", 24 * 60 * 60),
+            )
+
+    def build_url(
         self,
         resource_type: str,
         resource_id: Optional[ResourceId] = None,
@@ -77,7 +273,7 @@ class JSONAPIClient:
         sort: Optional[Sort] = None,
         page_size: Optional[int] = None,
         page_number: Optional[int] = None,
-    ) -> Dict:
+    ) -> str:
         url = self.url_for_resource(resource_type, resource_id=resource_id)
         params = {}
         params.update(self._get_fields(resource_type, fields))
@@ -92,7 +288,227 @@ class JSONAPIClient:
             params["sort"] = ",".join(sort)
         if params:
             url += "?" + urlencode(params)
-        response = self.session.get(url)
+        return url
+
+
+class JSONAPIClient(BaseJSONAPIClient):
+    def __init__(self, deadline: Optional[float] = None):
+        super().__init__(deadline=deadline)
+        self.session = requests.Session()
+        self.session.headers.update(default_headers())
+
+    def _send(self, resource_type: str, url: str, **kwargs) -> requests.Response:
+        # An exhausted budget of the caller is no failure of the upstream
+        self._check_deadline()
+        circuit_breaker = self._get_circuit_breaker(resource_type)
+        try:
+            response = self._send_with_retries(resource_type, url, **kwargs)
+        except JSONAPIClientError:
+            self._record_outcome(circuit_breaker)
+            raise
+        except BaseException:
+            self._record_abort(circuit_breaker)
+            raise
+        self._record_outcome(circuit_breaker, response)
+        return response
+
+    def _send_with_retries(self, resource_type: str, url: str, **kwargs) -> requests.Response:
+        self._mount_adapter(resource_type)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, timeout=self._get_timeout(resource_type), **kwargs)
+            except requests.RequestException as error:
+                delay = self._get_retry_delay(resource_type, attempt)
+                if delay is None:
+                    raise JSONAPIClientError(f"Request Error: {error}") from error
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                delay = self._get_retry_delay(resource_type, attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _mount_adapter(self, resource_type: str) -> None:
+        api_url = get_model(resource_type)._meta.api_url
+        if api_url not in self.session.adapters:
+            self.session.mount(api_url, get_adapter(api_url))
+
+    def get(
+        self,
+        resource_type: str,
+        resource_id: Optional[ResourceId] = None,
+        filters: Optional[Filters] = None,
+        include: Optional[Include] = None,
+        fields: Optional[Fields] = None,
+        sort: Optional[Sort] = None,
+        page_size: Optional[int] = None,
+        page_number: Optional[int] = None,
+    ) -> Dict:
+        url = self.build_url(
+            resource_type,
+            resource_id=resource_id,
+            filters=filters,
+            include=include,
+            fields=fields,
+            sort=sort,
+            page_size=page_size,
+            page_number=page_number,
+        )
+        return self.get_url(resource_type, url)
+
+    def get_url(self, resource_type: str, url: str) -> Dict:
+        url = self._resolve_url(resource_type, url)
+        if getattr(settings, "DJANGO_JSON_API_SINGLE_FLIGHT", True):
+            return _single_flight.do(url, lambda: self._fetch(resource_type, url))
+        return self._fetch(resource_type, url)
+
+    def _fetch(self, resource_type: str, url: str) -> Dict:
+        stored = self._get_stored_document(resource_type, url)
+        response = self._send(resource_type, url, headers=self._get_conditional_headers(stored))
+        if response.status_code == 304 and stored is not None:
+            return get_json_decoder()(stored["content"])
         if not response.ok:
             raise JSONAPIClientError(f"HTTP Error: {response.status_code}", response=response)
-        return response.json()
+        self._store_document(resource_type, url, response)
+        return get_json_decoder()(response.content)
+
+    def stream(
+        self, resource_type: str, chunk_size: int = 64 * 1024, **kwargs
+    ) -> Iterator[Tuple[str, Any]]:
+        url = self.build_url(resource_type, **kwargs)
+        return self.stream_url(resource_type, url, chunk_size=chunk_size)
+
+    def stream_url(
+        self, resource_type: str, url: str, chunk_size: int = 64 * 1024
+    ) -> Iterator[Tuple[str, Any]]:
+        url = self._resolve_url(resource_type, url)
+        with self._send(resource_type, url, stream=True) as response:
+            if not response.ok:
+                raise JSONAPIClientError(f"HTTP Error: {response.status_code}", response=response)
+            yield from iter_document(response.iter_content(chunk_size=chunk_size))
+
+
+_async_sessions: WeakKeyDictionary = WeakKeyDictionary()
+_async_sessions_lock = Lock()
+
+
+def get_async_session(api_url: str) -> "httpx.AsyncClient":
+    # httpx connection pools are bound to the event loop they are used in: one session is
+    # shared per running loop and api_url, as pooled adapters are for the sync client
+    loop = asyncio.get_running_loop()
+    with _async_sessions_lock:
+        sessions = _async_sessions.setdefault(loop, {})
+        session = sessions.get(api_url)
+        if session is None or session.is_closed:
+            if httpx is None:
+                raise ImproperlyConfigured("AsyncJSONAPIClient requires httpx to be installed")
+            session = sessions[api_url] = httpx.AsyncClient(headers=default_headers())
+    return session
+
+
+async def close_async_sessions() -> None:
+    with _async_sessions_lock:
+        sessions = _async_sessions.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.aclose()
+
+
+class AsyncJSONAPIClient(BaseJSONAPIClient):
+    def __init__(
+        self, deadline: Optional[float] = None, session: Optional["httpx.AsyncClient"] = None
+    ):
+        if httpx is None:
+            raise ImproperlyConfigured("AsyncJSONAPIClient requires httpx to be installed")
+        super().__init__(deadline=deadline)
+        # Sessions passed in are shared, and left open by aclose()
+        self._owns_session = session is None
+        self.session = httpx.AsyncClient(headers=default_headers()) if session is None else session
+        # Sent along with every request, without altering a shared session
+        self.headers: Dict[str, str] = {}
+
+    async def _send(self, resource_type: str, url: str, **kwargs) -> "httpx.Response":
+        self._check_deadline()
+        circuit_breaker = self._get_circuit_breaker(resource_type)
+        try:
+            response = await self._send_with_retries(resource_type, url, **kwargs)
+        except JSONAPIClientError:
+            self._record_outcome(circuit_breaker)
+            raise
+        except BaseException:
+            self._record_abort(circuit_breaker)
+            raise
+        self._record_outcome(circuit_breaker, response)
+        return response
+
+    async def _send_with_retries(self, resource_type: str, url: str, **kwargs) -> "httpx.Response":
+        kwargs["headers"] = {**self.headers, **kwargs.get("headers", {})}
+        attempt = 0
+        while True:
+            timeout = self._get_timeout(resource_type)
+            if isinstance(timeout, tuple):
+                connect, read = timeout
+                timeout = httpx.Timeout(read, connect=connect)
+            try:
+                response = await self.session.get(url, timeout=timeout, **kwargs)
+            except httpx.TransportError as error:
+                delay = self._get_retry_delay(resource_type, attempt)
+                if delay is None:
+                    raise JSONAPIClientError(f"Request Error: {error}") from error
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                delay = self._get_retry_delay(resource_type, attempt, response)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def __aenter__(self) -> "AsyncJSONAPIClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._owns_session:
+            await self.session.aclose()
+
+    async def get(
+        self,
+        resource_type: str,
+        resource_id: Optional[ResourceId] = None,
+        filters: Optional[Filters] = None,
+        include: Optional[Include] = None,
+        fields: Optional[Fields] = None,
+        sort: Optional[Sort] = None,
+        page_size: Optional[int] = None,
+        page_number: Optional[int] = None,
+    ) -> Dict:
+        url = self.build_url(
+            resource_type,
+            resource_id=resource_id,
+            filters=filters,
+            include=include,
+            fields=fields,
+            sort=sort,
+            page_size=page_size,
+            page_number=page_number,
+        )
+        return await self.get_url(resource_type, url)
+
+    async def get_url(self, resource_type: str, url: str) -> Dict:
+        url = self._resolve_url(resource_type, url)
+        stored = self._get_stored_document(resource_type, url)
+        response = await self._send(
+            resource_type, url, headers=self._get_conditional_headers(stored)
+        )
+        if response.status_code == 304 and stored is not None:
+            return get_json_decoder()(stored["content"])
+        if not response.is_success:
+            raise JSONAPIClientError(f"HTTP Error: {response.status_code}", response=response)
+        self._store_document(resource_type, url, response)
+        return get_json_decoder()(response.content)
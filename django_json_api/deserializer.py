@@ -0,0 +1,113 @@
+from typing import Any, Callable, Dict, Optional
+
+from django_json_api.fields import RAW_ATTRIBUTES, Relationship, to_compact_identifier
+
+EMPTY: Dict = {}
+
+Deserializer = Callable[[dict, Optional[Any]], Any]
+
+
+def build_deserializer(model) -> Deserializer:
+    # Generates a function mapping a resource dict straight into instance state, with one
+    # statement per field, rather than merging dicts and going through __init__ and setattr
+    if getattr(model._meta, "compact", False):
+        return build_compact_deserializer(model)
+    namespace = {"model": model, "EMPTY": EMPTY}
+    lines = [
+        "def deserialize(resource, existing=None):",
+        "    record = model.__new__(model)",
+        "    state = record.__dict__",
+        '    state["pk"] = int(resource["id"])',
+        '    attributes = resource.get("attributes") or EMPTY',
+        '    relationships = resource.get("relationships") or EMPTY',
+    ]
+    lazy_attributes = getattr(model._meta, "lazy_attributes", False)
+    if lazy_attributes:
+        lines.append("    raw = {}")
+    for index, (name, field) in enumerate(model._meta.fields.items()):
+        clean = f"clean_{index}"
+        namespace[clean] = field.clean
+        if isinstance(field, Relationship):
+            key = f"{field.name}_identifiers" if field.many else f"{field.name}_identifier"
+            value = f'{clean}(relationship["data"])' + (" or []" if field.many else "")
+            lines += [
+                f"    relationship = relationships.get({name!r})",
+                '    if relationship is not None and "data" in relationship:',
+                f"        state[{key!r}] = {value}",
+                f"    elif existing is not None and {key!r} in existing.__dict__:",
+                f"        state[{key!r}] = existing.__dict__[{key!r}]",
+            ]
+        elif lazy_attributes:
+            lines += [
+                f"    if {name!r} in attributes:",
+                f"        raw[{field.name!r}] = attributes[{name!r}]",
+            ]
+        else:
+            lines += [
+                f"    if {name!r} in attributes:",
+                f"        state[{field.name!r}] = {clean}(attributes[{name!r}])",
+            ]
+    if lazy_attributes:
+        lines += ["    if raw:", f"        state[{RAW_ATTRIBUTES!r}] = raw"]
+    lines.append("    return record")
+    exec("\n".join(lines), namespace)
+    return namespace["deserialize"]
+
+
+def build_compact_deserializer(model) -> Deserializer:
+    # Same as above, writing straight to the slots of compact models
+    namespace = {"model": model, "EMPTY": EMPTY, "compact": to_compact_identifier}
+    lines = [
+        "def deserialize(resource, existing=None):",
+        "    record = model.__new__(model)",
+        '    record.pk = int(resource["id"])',
+        '    attributes = resource.get("attributes") or EMPTY',
+        '    relationships = resource.get("relationships") or EMPTY',
+    ]
+    lazy_attributes = getattr(model._meta, "lazy_attributes", False)
+    if lazy_attributes:
+        lines.append("    raw = {}")
+    for index, (name, field) in enumerate(model._meta.fields.items()):
+        clean = f"clean_{index}"
+        namespace[clean] = field.clean
+        if isinstance(field, Relationship):
+            slot = f"_{field.name}_ids"
+            value = (
+                f'tuple(map(compact, {clean}(relationship["data"]) or ()))'
+                if field.many
+                else f'compact({clean}(relationship["data"]))'
+            )
+            lines += [
+                f"    relationship = relationships.get({name!r})",
+                '    if relationship is not None and "data" in relationship:',
+                f"        record.{slot} = {value}",
+                f"    elif existing is not None and hasattr(existing, {slot!r}):",
+                f"        record.{slot} = existing.{slot}",
+            ]
+        elif lazy_attributes:
+            lines += [
+                f"    if {name!r} in attributes:",
+                f"        raw[{field.name!r}] = attributes[{name!r}]",
+            ]
+        else:
+            lines += [
+                f"    if {name!r} in attributes:",
+                f"        record._{field.name}_value = {clean}(attributes[{name!r}])",
+            ]
+    if lazy_attributes:
+        lines += ["    if raw:", f"        record.{RAW_ATTRIBUTES} = raw"]
+    lines.append("    return record")
+    exec("\n".join(lines), namespace)
+    return namespace["deserialize"]
+
+
+def build_relationships_check(model) -> Callable[[dict], bool]:
+    names = tuple(
+        name for name, field in model._meta.fields.items() if isinstance(field, Relationship)
+    )
+
+    def lacks_relationships(resource: dict) -> bool:
+        relationships = resource.get("relationships") or EMPTY
+        return any("data" not in (relationships.get(name) or EMPTY) for name in names)
+
+    return lacks_relationships
@@ -1,5 +1,13 @@
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
 from dateutil.parser import parse
 
+from django_json_api.registry import get_model
+
 
 def is_identifier(value):
     return isinstance(value, dict) and "id" in value and "type" in value
@@ -15,13 +23,8 @@ def get_identifier(value):
     return None
 
 
-def get_model(resource_type):
-    from django_json_api.models import JSONAPIModel
-
-    for klass in JSONAPIModel.__subclasses__():
-        if klass._meta.resource_type == resource_type:
-            return klass
-    return None
+# Instance state key of raw values for models with `Meta.lazy_attributes`
+RAW_ATTRIBUTES = "_raw_attributes"
 
 
 class AttributeDescriptor:
@@ -31,7 +34,20 @@ class AttributeDescriptor:
     def __get__(self, obj, obj_type=None):
         if obj is None:
             return self
-        return obj.__dict__.get(self.field.name)
+        state = obj.__dict__
+        try:
+            return state[self.field.name]
+        except KeyError:
+            raw = state.get(RAW_ATTRIBUTES) or {}
+        # Records are shared between threads: the raw value is read once, and when another
+        # thread cleaned it meanwhile, it is memoized already
+        value = raw.get(self.field.name, ...)
+        if value is ...:
+            return state.get(self.field.name)
+        # Cleaned on first access only, then memoized as any other value
+        value = state[self.field.name] = self.field.clean(value)
+        raw.pop(self.field.name, None)
+        return value
 
     def __set__(self, obj, value):
         obj.__dict__[self.field.name] = value
@@ -49,9 +65,18 @@ class RelationshipDescriptor:
         if self.field.many:
             if not hasattr(obj, f"{self.field.name}_identifiers"):
                 obj.refresh_from_api()
+            identifiers = getattr(obj, f"{self.field.name}_identifiers", [])
+            grouped_ids = defaultdict(list)
+            for identifier in identifiers:
+                grouped_ids[identifier["type"]].append(identifier["id"])
+            fetched = {
+                resource_type: get_model(resource_type).get_many(record_ids)
+                for resource_type, record_ids in grouped_ids.items()
+            }
             result = [
-                get_model(resource["type"]).objects.get(pk=resource["id"])
-                for resource in getattr(obj, f"{self.field.name}_identifiers", [])
+                fetched[resource["type"]].get(int(resource["id"]))
+                or get_model(resource["type"]).objects.get(pk=resource["id"])
+                for resource in identifiers
             ]
         else:
             if not hasattr(obj, f"{self.field.name}_identifier"):
@@ -89,9 +114,57 @@ class Attribute:
         return value
 
 
+def parse_datetime(value):
+    # Strict ISO 8601 timestamps, as emitted by JSON:API servers, skip dateutil's slow parser
+    try:
+        return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        return parse(value)
+
+
 class DateTimeAttribute(Attribute):
     def clean(self, value):
-        return parse(value) if isinstance(value, str) else None
+        return parse_datetime(value) if isinstance(value, str) else None
+
+
+class DateAttribute(Attribute):
+    def clean(self, value):
+        if not isinstance(value, str):
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return parse(value).date()
+
+
+class IntegerAttribute(Attribute):
+    def clean(self, value):
+        return int(value) if isinstance(value, (int, float, str)) else None
+
+
+class DecimalAttribute(Attribute):
+    def __init__(self, max_digits=None, decimal_places=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+
+    def clean(self, value):
+        # Going through str keeps the decimal digits of floats as written in the document
+        return Decimal(str(value)) if isinstance(value, (int, float, str)) else None
+
+
+class UUIDAttribute(Attribute):
+    def clean(self, value):
+        return UUID(value) if isinstance(value, str) else None
+
+
+class EnumAttribute(Attribute):
+    def __init__(self, enum, **kwargs):
+        super().__init__(**kwargs)
+        self.enum = enum
+
+    def clean(self, value):
+        return self.enum(value) if value is not None else None
 
 
 class Relationship(Attribute):
@@ -112,3 +185,100 @@ class Relationship(Attribute):
                 value = value[0]
             return get_identifier(value)
         return None
+
+
+class CompactAttributeDescriptor(AttributeDescriptor):
+    def __init__(self, field):
+        super().__init__(field)
+        self.slot = f"_{field.name}_value"
+
+    def __get__(self, obj, obj_type=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            raw = getattr(obj, RAW_ATTRIBUTES, None) or {}
+        value = raw.get(self.field.name, ...)
+        if value is ...:
+            return getattr(obj, self.slot, None)
+        value = self.field.clean(value)
+        setattr(obj, self.slot, value)
+        raw.pop(self.field.name, None)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+def to_compact_identifier(identifier):
+    if identifier is None:
+        return None
+    record_id = identifier["id"]
+    if isinstance(record_id, str) and record_id.isdigit():
+        record_id = int(record_id)
+    return sys.intern(identifier["type"]), record_id
+
+
+def from_compact_identifier(value):
+    return None if value is None else {"id": str(value[1]), "type": value[0]}
+
+
+def compact_identifiers_property(field):
+    # Identifiers are kept as (type, id) tuples and exposed as dicts, as on other models
+    slot = f"_{field.name}_ids"
+    if field.many:
+
+        def fget(obj):
+            value = getattr(obj, slot)
+            return None if value is None else list(map(from_compact_identifier, value))
+
+        def fset(obj, value):
+            setattr(obj, slot, None if value is None else tuple(map(to_compact_identifier, value)))
+
+    else:
+
+        def fget(obj):
+            return from_compact_identifier(getattr(obj, slot))
+
+        def fset(obj, value):
+            setattr(obj, slot, to_compact_identifier(value))
+
+    def fdel(obj):
+        delattr(obj, slot)
+
+    return property(fget, fset, fdel)
+
+
+def get_state_attributes(fields):
+    # (instance state key, attribute) pairs of compact models, see JSONAPIModel._get_state
+    attributes = [("pk", "pk"), (RAW_ATTRIBUTES, RAW_ATTRIBUTES)]
+    for field in fields.values():
+        if isinstance(field, Relationship):
+            key = f"{field.name}_identifiers" if field.many else f"{field.name}_identifier"
+            attributes += [(key, key), (f"_{field.name}_cache", f"_{field.name}_cache")]
+        else:
+            attributes.append((field.name, f"_{field.name}_value"))
+    return attributes
+
+
+def get_compact_slots(fields):
+    # Called before fields are contributed, when their name may not be set yet
+    slots = ["pk", RAW_ATTRIBUTES]
+    for name, field in fields.items():
+        field_name = field.name or name
+        if isinstance(field, Relationship):
+            slots += [f"_{field_name}_ids", f"_{field_name}_cache"]
+        else:
+            slots.append(f"_{field_name}_value")
+    return slots
+
+
+def make_compact(model):
+    for name, field in model._meta.fields.items():
+        if isinstance(field, Relationship):
+            key = f"{field.name}_identifiers" if field.many else f"{field.name}_identifier"
+            setattr(model, key, compact_identifiers_property(field))
+        else:
+            setattr(model, name, CompactAttributeDescriptor(field))
+    model._meta.state_attributes = get_state_attributes(model._meta.fields)
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+__all__ = ("IdentityMapMiddleware", "use_identity_map")
+
+IdentityMap = Dict[Tuple[str, int], Any]
+
+_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar(
+    "django_json_api_identity_map", default=None
+)
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    return _identity_map.get()
+
+
+@contextmanager
+def use_identity_map() -> Iterator[IdentityMap]:
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        yield identity_map
+        return
+    token = _identity_map.set({})
+    try:
+        yield _identity_map.get()
+    finally:
+        _identity_map.reset(token)
+
+
+def recall(model, pks: Iterable[int]) -> Dict[int, Any]:
+    identity_map = _identity_map.get()
+    if not identity_map:
+        return {}
+    resource_type = model._meta.resource_type
+    records = {pk: identity_map.get((resource_type, pk)) for pk in pks}
+    return {pk: record for pk, record in records.items() if record is not None}
+
+
+def remember(record: Any) -> Any:
+    identity_map = _identity_map.get()
+    if identity_map is None or record is None or record.pk is None:
+        return record
+    existing = identity_map.setdefault((record._meta.resource_type, record.pk), record)
+    if existing is not record:
+        # Fresh data is copied onto the instance already handed out during this request
+        existing._set_state(record._get_state())
+    return existing
+
+
+class IdentityMapMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with use_identity_map():
+            return self.get_response(request)
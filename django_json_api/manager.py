@@ -1,12 +1,112 @@
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
-from typing import Iterator, List, Union
+from itertools import islice
+from math import ceil
+from queue import Full, Queue
+from threading import Condition, Event, Lock, Thread, local
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
 
-from django_json_api.client import JSONAPIClient
+import requests
+from django.conf import settings
+
+from django_json_api.caching import NOT_FOUND, await_unlock, cache_lock, wait_for_unlock
+from django_json_api.client import (
+    AsyncJSONAPIClient,
+    JSONAPICircuitOpenError,
+    JSONAPIClient,
+    JSONAPIClientError,
+    get_async_session,
+)
+
+_batch_loaders_lock = Lock()
+
+CURSOR_PARAMS = {"page[cursor]", "page[after]"}
+
+
+def is_not_found(error: JSONAPIClientError) -> bool:
+    return error.response is not None and error.response.status_code == 404
+
+
+def not_found_error() -> JSONAPIClientError:
+    # Raised for negatively cached records, as if the upstream had answered again
+    response = requests.Response()
+    response.status_code = 404
+    return JSONAPIClientError("HTTP Error: 404", response=response)
+
+
+class BatchLoader:
+    def __init__(self, manager: "JSONAPIManager", window: float):
+        self.manager = manager
+        self.window = window
+        self._pending: Dict[int, Future] = {}
+        # get() calls in flight which did not reach load() yet, and may still join the batch
+        self._incoming = 0
+        self._condition = Condition()
+        self._local = local()
+
+    @contextmanager
+    def expect(self) -> Iterator[None]:
+        with self._condition:
+            self._incoming += 1
+        self._local.joined = False
+        try:
+            yield
+        finally:
+            if not self._local.joined:
+                with self._condition:
+                    self._incoming -= 1
+                    self._condition.notify_all()
+
+    def load(self, pk: int) -> "JSONAPIModel":  # noqa
+        self._local.joined = True
+        with self._condition:
+            self._incoming -= 1
+            leader = not self._pending
+            future = self._pending.get(pk)
+            if future is None:
+                future = self._pending[pk] = Future()
+            self._condition.notify_all()
+            if leader:
+                # Only get() calls already in flight are waited for, at most for the window, so
+                # that sequential calls are not delayed
+                deadline = time.monotonic() + self.window
+                while self._incoming > 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, {}
+        if leader:
+            self._dispatch(batch)
+        return future.result()
+
+    def _dispatch(self, batch: Dict[int, Future]) -> None:
+        many_id_lookup = self.manager.model._meta.many_id_lookup
+        try:
+            manager = self.manager.filter(**{many_id_lookup: ",".join(map(str, batch))})
+            records = {record.pk: record for record in manager.iterator()}
+        except Exception as error:
+            for future in batch.values():
+                future.set_exception(error)
+            return
+        for pk, future in batch.items():
+            if pk in records:
+                future.set_result(records[pk])
+                continue
+            try:
+                future.set_result(self.manager._get_from_api(pk))
+            except Exception as error:
+                future.set_exception(error)
 
 
 class JSONAPIManager:
     def __init__(self, model, **kwargs):
-        self.client = JSONAPIClient()
+        self._client = None
+        self._loader = None
         self.model = model
         self._fields = kwargs.get("fields", {})
         self._include = kwargs.get("include", [])
@@ -47,10 +147,29 @@ class JSONAPIManager:
     def fields(self, **kwargs) -> "JSONAPIManager":
         return self.modify(fields=kwargs)
 
+    @property
+    def client(self) -> JSONAPIClient:
+        if self._client is None:
+            self._client = JSONAPIClient()
+        return self._client
+
+    @property
+    def batch_loader(self) -> Optional[BatchLoader]:
+        batch_window = getattr(self.model._meta, "batch_window", None)
+        if not batch_window or not getattr(self.model._meta, "many_id_lookup", None):
+            return None
+        with _batch_loaders_lock:
+            if self._loader is None or self._loader.window != batch_window:
+                self._loader = BatchLoader(self, batch_window)
+        return self._loader
+
     @property
     def resource_type(self) -> str:
         return self.model._meta.resource_type
 
+    def build_url(self, page_number: int = 1) -> str:
+        return self.client.build_url(self.resource_type, **self._get_page_kwargs(page_number))
+
     def _fetch_get(self, resource_id: Union[str, int] = None) -> dict:
         return self.client.get(
             self.resource_type,
@@ -61,29 +180,240 @@ class JSONAPIManager:
             sort=self._sort,
         )
 
-    def _fetch_iterate(self) -> Iterator:
-        client = JSONAPIClient()
+    def _get_page_kwargs(self, page_number: int) -> dict:
+        return {
+            "filters": self._filters,
+            "include": self._include or None,
+            "fields": self._fields,
+            "sort": self._sort,
+            "page_size": getattr(self.model._meta, "page_size", 50),
+            "page_number": (
+                None if getattr(self.model._meta, "pagination", None) == "cursor" else page_number
+            ),
+        }
+
+    def _get_cursor_url(self, next_url: Optional[str]) -> Optional[str]:
+        # The link to follow as is with cursor-based pagination, None with page[number] pagination
+        pagination = getattr(self.model._meta, "pagination", None)
+        if next_url is None or pagination == "number":
+            return None
+        if pagination == "cursor" or CURSOR_PARAMS & set(parse_qs(urlparse(next_url).query)):
+            return next_url
+        return None
+
+    def _get_iteration_deadline(self) -> Optional[float]:
+        budget = getattr(
+            self.model._meta,
+            "iteration_deadline",
+            getattr(settings, "DJANGO_JSON_API_ITERATION_DEADLINE", None),
+        )
+        return None if budget is None else time.monotonic() + budget
+
+    def _get_page_count(self, page: dict) -> Optional[int]:
+        meta = page.get("meta") or {}
+        pages = (meta.get("pagination") or {}).get("pages")
+        if pages is not None:
+            return pages
+        last_url = (page.get("links") or {}).get("last")
+        if last_url:
+            last_page_number = parse_qs(urlparse(last_url).query).get("page[number]")
+            if last_page_number:
+                return int(last_page_number[0])
+        record_count = meta.get("record_count")
+        if record_count is None:
+            return None
+        # The server may cap page[size] below the requested one: the record count only tells the
+        # page count when the first page is full, otherwise pages are fetched one after another
+        page_size = self._get_page_kwargs(1)["page_size"]
+        if len(page.get("data") or []) < page_size and (page.get("links") or {}).get("next"):
+            return None
+        return max(1, ceil(record_count / page_size))
+
+    def _fetch_parallel_pages(
+        self, client: JSONAPIClient, page_numbers: Iterable[int], workers: int
+    ) -> Iterator[dict]:
+        def fetch(page_number):
+            return client.get(self.resource_type, **self._get_page_kwargs(page_number))
+
+        page_numbers = iter(page_numbers)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque(executor.submit(fetch, n) for n in islice(page_numbers, workers))
+        try:
+            while pending:
+                page = pending.popleft().result()
+                pending.extend(executor.submit(fetch, n) for n in islice(page_numbers, 1))
+                yield page
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _fetch_pages(self) -> Iterator[dict]:
+        client = JSONAPIClient(deadline=self._get_iteration_deadline())
+        page_workers = getattr(self.model._meta, "page_workers", 1)
+        if page_workers <= 1:
+            client.session.headers["X-No-Count"] = "true"
+        page_number = 1
+        page = client.get(self.resource_type, **self._get_page_kwargs(page_number))
+        # Only the first page is needed to tell the page count
+        client.session.headers["X-No-Count"] = "true"
+        while True:
+            yield page
+            next_url = page.get("links", {}).get("next")
+            if next_url is None:
+                break
+            cursor_url = self._get_cursor_url(next_url)
+            if cursor_url is not None:
+                page = client.get_url(self.resource_type, cursor_url)
+                continue
+            page_number += 1
+            page_count = self._get_page_count(page) if page_workers > 1 else None
+            if page_count is not None:
+                yield from self._fetch_parallel_pages(
+                    client, range(page_number, page_count + 1), page_workers
+                )
+                break
+            page = client.get(self.resource_type, **self._get_page_kwargs(page_number))
+
+    def _read_ahead(self, pages: Iterator[dict], depth: int) -> Iterator[dict]:
+        buffer = Queue(maxsize=depth)
+        stopped = Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stopped.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+                put(done)
+            except Exception as exception:
+                put(exception)
+            finally:
+                pages.close()
+
+        producer = Thread(target=produce, name="jsonapi-read-ahead", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+
+    def _fetch_streamed(self) -> Iterator:
+        client = JSONAPIClient(deadline=self._get_iteration_deadline())
         client.session.headers["X-No-Count"] = "true"
-        page_size = getattr(self.model._meta, "page_size", 50)
         page_number = 1
+        # Resources go through from_resources in small batches, which bounds memory while
+        # grouping cache reads and writes
+        batch_size = getattr(self.model._meta, "stream_batch_size", 50)
+        includes = bool(client._get_include(self.resource_type, self._include or None))
+        events = client.stream(self.resource_type, **self._get_page_kwargs(page_number))
         while True:
-            page = client.get(
-                self.resource_type,
-                filters=self._filters,
-                include=self._include or None,
-                fields=self._fields,
-                sort=self._sort,
-                page_size=page_size,
-                page_number=page_number,
-            )
+            next_url = None
+            data, included = [], []
+            # Records are only yielded once the resources they may refer to are cached, and
+            # servers usually send `included` after `data`
+            awaiting_included = includes
+            for member, value in events:
+                if member == "data":
+                    data.append(value)
+                    if not awaiting_included and len(data) >= batch_size:
+                        if included:
+                            self.model.from_resources(included)
+                            included = []
+                        yield from self.model.from_resources(data)
+                        data = []
+                elif member == "included":
+                    awaiting_included = False
+                    included.append(value)
+                    if len(included) >= batch_size:
+                        self.model.from_resources(included)
+                        included = []
+                elif member == "links":
+                    next_url = (value or {}).get("next")
+            if included:
+                self.model.from_resources(included)
+            for start in range(0, len(data), batch_size):
+                yield from self.model.from_resources(data[start : start + batch_size])
+            if next_url is None:
+                break
+            cursor_url = self._get_cursor_url(next_url)
+            if cursor_url is not None:
+                events = client.stream_url(self.resource_type, cursor_url)
+            else:
+                page_number += 1
+                events = client.stream(self.resource_type, **self._get_page_kwargs(page_number))
+
+    def _fetch_iterate(self, read_ahead: Optional[int] = None) -> Iterator:
+        if getattr(self.model._meta, "stream_pages", False):
+            yield from self._fetch_streamed()
+            return
+        if read_ahead is None:
+            read_ahead = getattr(self.model._meta, "read_ahead", 0)
+        pages = self._fetch_pages()
+        if read_ahead > 0:
+            pages = self._read_ahead(pages, read_ahead)
+        for page in pages:
             included = page.get("included") or []
             data = page.get("data")
-            page_number += 1
             self.model.from_resources(included)
             yield from self.model.from_resources(data)
-            next_url = page.get("links", {}).get("next")
-            if next_url is None:
-                break
+
+    def _get_async_client(self, deadline: Optional[float] = None) -> AsyncJSONAPIClient:
+        # Clients are cheap, the connection pool lives in the session shared per event loop
+        session = get_async_session(self.model._meta.api_url)
+        return AsyncJSONAPIClient(deadline=deadline, session=session)
+
+    async def _afetch_get(
+        self, resource_id: Union[str, int] = None, client: AsyncJSONAPIClient = None
+    ) -> dict:
+        if client is None:
+            client = self._get_async_client()
+        return await client.get(
+            self.resource_type,
+            resource_id=resource_id,
+            filters=self._filters,
+            include=self._include or None,
+            fields=self._fields,
+            sort=self._sort,
+        )
+
+    async def _afetch_iterate(self) -> AsyncIterator:
+        async with self._get_async_client(deadline=self._get_iteration_deadline()) as client:
+            client.headers["X-No-Count"] = "true"
+            page_number = 1
+            page = await client.get(self.resource_type, **self._get_page_kwargs(page_number))
+            while True:
+                included = page.get("included") or []
+                data = page.get("data")
+                self.model.from_resources(included)
+                for record in self.model.from_resources(data):
+                    yield record
+                next_url = page.get("links", {}).get("next")
+                if next_url is None:
+                    break
+                cursor_url = self._get_cursor_url(next_url)
+                if cursor_url is not None:
+                    page = await client.get_url(self.resource_type, cursor_url)
+                else:
+                    page_number += 1
+                    page = await client.get(
+                        self.resource_type, **self._get_page_kwargs(page_number)
+                    )
 
     def _fetch_all(self) -> List["JSONAPIModel"]:  # noqa
         if self._cache is None:
@@ -100,19 +430,123 @@ class JSONAPIManager:
         )
         return data.get("meta", {}).get("record_count")
 
-    def iterator(self) -> Iterator["JSONAPIModel"]:  # noqa
-        return self._fetch_iterate()
+    def iterator(self, read_ahead: Optional[int] = None) -> Iterator["JSONAPIModel"]:  # noqa
+        return self._fetch_iterate(read_ahead=read_ahead)
 
     def all(self) -> List["JSONAPIModel"]:  # noqa
         return self._fetch_all()
 
-    def get(self, pk, ignore_cache=False) -> "JSONAPIModel":  # noqa
-        record = self.model.from_cache(pk)
-        if record is None or ignore_cache:
+    def _get_from_api(self, pk) -> "JSONAPIModel":  # noqa
+        try:
             document = self._fetch_get(resource_id=pk)
-            data = document["data"]
-            record = self.model.from_resource(data)
-            self.model.from_resources(document.get("included") or [])
+        except JSONAPIClientError as error:
+            if is_not_found(error):
+                self.model.cache_not_found([pk])
+            raise
+        data = document["data"]
+        record = self.model.from_resource(data)
+        self.model.from_resources(document.get("included") or [])
+        return record
+
+    def _load(self, pk, record=None) -> "JSONAPIModel":  # noqa
+        try:
+            batch_loader = self.batch_loader
+            if batch_loader is not None:
+                return batch_loader.load(int(pk))
+            return self._get_from_api(pk)
+        except JSONAPICircuitOpenError:
+            if record is None or not getattr(self.model._meta, "circuit_breaker_fallback", False):
+                raise
+        return record
+
+    def _load_once(self, pk) -> "JSONAPIModel":  # noqa
+        cache_key = self.model.cache_key(pk)
+        lock_timeout = getattr(self.model._meta, "cache_lock_timeout", None)
+        with cache_lock(cache_key, lock_timeout) as acquired:
+            if acquired:
+                return self._load(pk)
+        # Another worker is fetching the record: read it from the cache once it is done
+        wait_for_unlock(cache_key, lock_timeout)
+        record = self.model._from_cache(pk, revalidate=False)
+        if record == NOT_FOUND:
+            raise not_found_error()
+        return self._load(pk) if record is None else record
+
+    def _get(self, pk, ignore_cache=False) -> "JSONAPIModel":  # noqa
+        record = self.model._from_cache(pk, revalidate=not ignore_cache)
+        if record == NOT_FOUND:
+            if not ignore_cache:
+                raise not_found_error()
+            record = None
+        if ignore_cache:
+            return self._load(pk, record)
+        if record is None:
+            return self._load_once(pk)
+        return record
+
+    def get(self, pk, ignore_cache=False) -> "JSONAPIModel":  # noqa
+        batch_loader = self.batch_loader
+        if batch_loader is None:
+            return self._get(pk, ignore_cache=ignore_cache)
+        with batch_loader.expect():
+            return self._get(pk, ignore_cache=ignore_cache)
+
+    async def acount(self) -> int:
+        async with self._get_async_client() as client:
+            data = await client.get(
+                self.resource_type,
+                include=[],
+                fields={self.resource_type: []},
+                filters=self._filters,
+                page_size=1,
+            )
+        return data.get("meta", {}).get("record_count")
+
+    def aiterator(self) -> AsyncIterator["JSONAPIModel"]:  # noqa
+        return self._afetch_iterate()
+
+    async def aall(self) -> List["JSONAPIModel"]:  # noqa
+        if self._cache is None:
+            self._cache = [record async for record in self._afetch_iterate()]
+        return self._cache
+
+    async def _aload(self, pk, record=None, client=None) -> "JSONAPIModel":  # noqa
+        try:
+            document = await self._afetch_get(resource_id=pk, client=client)
+        except JSONAPICircuitOpenError:
+            if record is None or not getattr(self.model._meta, "circuit_breaker_fallback", False):
+                raise
+            return record
+        except JSONAPIClientError as error:
+            if is_not_found(error):
+                self.model.cache_not_found([pk])
+            raise
+        record = self.model.from_resource(document["data"])
+        self.model.from_resources(document.get("included") or [])
+        return record
+
+    async def _aload_once(self, pk, client=None) -> "JSONAPIModel":  # noqa
+        cache_key = self.model.cache_key(pk)
+        lock_timeout = getattr(self.model._meta, "cache_lock_timeout", None)
+        with cache_lock(cache_key, lock_timeout) as acquired:
+            if acquired:
+                return await self._aload(pk, client=client)
+        await await_unlock(cache_key, lock_timeout)
+        record = self.model._from_cache(pk, revalidate=False)
+        if record == NOT_FOUND:
+            raise not_found_error()
+        return await self._aload(pk, client=client) if record is None else record
+
+    async def aget(self, pk, ignore_cache=False, client=None) -> "JSONAPIModel":  # noqa
+        record = self.model._from_cache(pk, revalidate=not ignore_cache)
+        if record == NOT_FOUND:
+            if not ignore_cache:
+                raise not_found_error()
+            record = None
+        if ignore_cache:
+            return await self._aload(pk, record, client=client)
+        if record is None:
+            return await self._aload_once(pk, client=client)
         return record
 
     def __getitem__(self, k) -> "JSONAPIModel":  # noqa
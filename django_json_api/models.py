@@ -1,21 +1,53 @@
+import asyncio
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type, TypeVar, Union
 
-from django.core.cache import cache
+from django.conf import settings
 
 from django_json_api.base import JSONAPIModelBase
+from django_json_api.caching import (
+    NOT_FOUND,
+    cache_get_many,
+    cache_lock,
+    cache_set_many,
+    cache_set_not_found,
+    schedule_refresh,
+)
+from django_json_api.identity_map import recall, remember
+from django_json_api.manager import JSONAPIManager
+from django_json_api.registry import get_model
 
 T = TypeVar("T", bound="JSONAPIModel")
 
+# Every id after the first one in a filter value is preceded by a url-encoded comma
+ENCODED_SEPARATOR_LENGTH = len("%2C")
 
-def _find_model_class(resource_type: str) -> Type:
-    for cls in JSONAPIModel.__subclasses__():
-        if resource_type == cls._meta.resource_type:
-            return cls
-    return None
+
+def chunk_ids(
+    record_ids: Iterable[int], base_length: int, max_length: int, max_count: Optional[int] = None
+) -> Iterator[List[int]]:
+    chunk, length = [], base_length
+    for record_id in record_ids:
+        id_length = len(str(record_id))
+        if chunk and (
+            length + ENCODED_SEPARATOR_LENGTH + id_length > max_length
+            or (max_count and len(chunk) >= max_count)
+        ):
+            yield chunk
+            chunk, length = [], base_length
+        if chunk:
+            length += ENCODED_SEPARATOR_LENGTH
+        chunk.append(record_id)
+        length += id_length
+    if chunk:
+        yield chunk
 
 
 class JSONAPIModel(metaclass=JSONAPIModelBase):
+    __slots__ = ()
+
     def __init__(self: T, **kwargs: int) -> None:
         self.pk = kwargs.pop("pk", None) or kwargs.pop("id", None)
         if self.pk is not None:
@@ -36,33 +68,57 @@ class JSONAPIModel(metaclass=JSONAPIModelBase):
             return self is other
         return int(my_pk) == int(other.pk)
 
+    def __hash__(self: T) -> int:
+        if self.pk is None:
+            raise TypeError("JSONAPIModel instances without primary key value are unhashable")
+        return hash((self.__class__, int(self.pk)))
+
+    def __getstate__(self: T) -> Dict:
+        # Resolved relationships are not pickled along with the record
+        resolved = {f"_{field.name}_cache" for field in self._meta.fields.values()}
+        return {name: value for name, value in self._get_state().items() if name not in resolved}
+
+    def __setstate__(self: T, state: Dict) -> None:
+        self._set_state(state)
+
+    def _get_state(self: T) -> Dict:
+        state_attributes = getattr(self._meta, "state_attributes", None)
+        if state_attributes is None:
+            return self.__dict__
+        state = {}
+        for key, attribute in state_attributes:
+            try:
+                state[key] = getattr(self, attribute)
+            except AttributeError:
+                pass
+        return state
+
+    def _set_state(self: T, state: Dict) -> None:
+        state_attributes = getattr(self._meta, "state_attributes", None)
+        if state_attributes is None:
+            self.__dict__.clear()
+            self.__dict__.update(state)
+            return
+        for key, attribute in state_attributes:
+            if key in state:
+                setattr(self, attribute, state[key])
+            elif hasattr(self, attribute):
+                delattr(self, attribute)
+
     @property
     def id(self: T) -> int:
         return self.pk
 
     @staticmethod
     def from_resource(resource_dict: dict, persist: Optional[bool] = True) -> T:
-        cls = _find_model_class(resource_dict["type"])
+        cls = get_model(resource_dict["type"])
         if cls:
-            kwargs = {}
-            data = {
-                **resource_dict.get("attributes", {}),
-                **{
-                    name: value["data"]
-                    for name, value in resource_dict.get("relationships", {}).items()
-                    if "data" in value
-                },
-            }
-            existing_cache = cls.from_cache(resource_dict["id"])
-            for name, field in cls._meta.fields.items():
-                try:
-                    kwargs[name] = field.clean(data[name])
-                except KeyError:
-                    if existing_cache and hasattr(existing_cache, f"{name}_identifiers"):
-                        kwargs[name] = getattr(existing_cache, f"{name}_identifiers")
-                    elif existing_cache and hasattr(existing_cache, f"{name}_identifier"):
-                        kwargs[name] = getattr(existing_cache, f"{name}_identifier")
-            record = cls(id=resource_dict["id"], **kwargs)
+            existing_cache = (
+                cls.from_cache(resource_dict["id"], revalidate=False)
+                if cls._meta.lacks_relationships(resource_dict)
+                else None
+            )
+            record = remember(cls._meta.deserialize(resource_dict, existing_cache))
             if persist:
                 record.cache()
             return record
@@ -76,10 +132,20 @@ class JSONAPIModel(metaclass=JSONAPIModelBase):
 
         records = []
         for resource_type, resources in grouped_records.items():
-            cls = _find_model_class(resource_type)
+            cls = get_model(resource_type)
             if cls:
+                deserialize = cls._meta.deserialize
+                existing_cache, _ = cls._get_many_from_cache(
+                    [item["id"] for item in resources if cls._meta.lacks_relationships(item)],
+                    revalidate=False,
+                )
                 records.extend(
-                    cls.cache_many([cls.from_resource(item, persist=False) for item in resources])
+                    cls.cache_many(
+                        [
+                            remember(deserialize(item, existing_cache.get(int(item["id"]))))
+                            for item in resources
+                        ]
+                    )
                 )
         return records
 
@@ -89,42 +155,136 @@ class JSONAPIModel(metaclass=JSONAPIModelBase):
         return f"jsonapi:{resource_type}:{pk}"
 
     @classmethod
-    def from_cache(cls: Type[T], pk: Union[str, int]) -> T:
-        return cache.get(cls.cache_key(pk))
+    def _refresh_cache(cls: Type[T], pk: Union[str, int]) -> None:
+        lock_timeout = getattr(cls._meta, "cache_lock_timeout", None)
+        with cache_lock(cls.cache_key(pk), lock_timeout) as acquired:
+            if acquired:
+                cls.objects.get(pk=pk, ignore_cache=True)
+
+    @classmethod
+    def _revalidate(cls: Type[T], pks: Iterable[Union[str, int]]) -> None:
+        for pk in pks:
+            schedule_refresh(cls.cache_key(pk), partial(cls._refresh_cache, pk))
+
+    @classmethod
+    def _from_cache(
+        cls: Type[T], pk: Union[str, int], revalidate: bool = True
+    ) -> Union[T, str, None]:
+        recalled = recall(cls, [int(pk)])
+        if recalled:
+            return recalled[int(pk)]
+        cache_key = cls.cache_key(pk)
+        values, stale = cache_get_many(cls, [cache_key])
+        if stale and revalidate:
+            cls._revalidate([pk])
+        record = values.get(cache_key)
+        return record if record == NOT_FOUND else remember(record)
+
+    @classmethod
+    def from_cache(cls: Type[T], pk: Union[str, int], revalidate: bool = True) -> T:
+        record = cls._from_cache(pk, revalidate=revalidate)
+        return None if record == NOT_FOUND else record
+
+    @classmethod
+    def _get_many_from_cache(
+        cls: Type[T], record_ids: List[Union[str, int]], revalidate: bool = True
+    ) -> Tuple[Dict, Set]:
+        record_ids = set(map(int, filter(bool, record_ids)))
+        recalled = recall(cls, record_ids)
+        cache_keys = {cls.cache_key(pk): pk for pk in record_ids - set(recalled)}
+        cached, stale = cache_get_many(cls, cache_keys)
+        if revalidate:
+            cls._revalidate(cache_keys[key] for key in stale)
+        records = {
+            cache_keys[key]: remember(value) for key, value in cached.items() if value != NOT_FOUND
+        }
+        records.update(recalled)
+        return records, set(cache_keys.values()) - {cache_keys[key] for key in cached}
+
+    @classmethod
+    def _chunk_missing_ids(cls: Type[T], missing: Iterable[int]) -> Iterator[List[int]]:
+        many_id_lookup = cls._meta.many_id_lookup
+        base_url = JSONAPIManager(cls).filter(**{many_id_lookup: ""}).build_url()
+        max_length = getattr(
+            cls._meta,
+            "max_url_length",
+            getattr(settings, "DJANGO_JSON_API_MAX_URL_LENGTH", 4096),
+        )
+        max_count = getattr(cls._meta, "many_id_max_count", None)
+        return chunk_ids(sorted(missing), len(base_url), max_length, max_count)
 
     @classmethod
     def get_many(cls: Type[T], record_ids: List[Union[str, int]]) -> Dict:
-        cache_keys = [cls.cache_key(pk) for pk in record_ids]
-        records = {record.id: record for record in cache.get_many(cache_keys).values()}
-        missing = set(map(int, filter(bool, record_ids))) - set(records)
+        records, missing = cls._get_many_from_cache(record_ids)
         if missing:
             many_id_lookup = getattr(cls._meta, "many_id_lookup", None)
             if many_id_lookup:
-                for item in cls.objects.filter(**{many_id_lookup: ",".join(map(str, missing))}):
-                    records[item.id] = item
+                tasks = list(cls._chunk_missing_ids(missing))
+
+                def fetch(chunk):
+                    return list(cls.objects.filter(**{many_id_lookup: ",".join(map(str, chunk))}))
+
+            else:
+                tasks = list(missing)
+
+                def fetch(missing_id):
+                    return [cls.objects.get(pk=missing_id)]
+
+            workers = min(getattr(cls._meta, "get_many_workers", 4), len(tasks))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(fetch, tasks))
+            else:
+                results = map(fetch, tasks)
+            for items in results:
+                records.update({item.id: remember(item) for item in items})
+            cls.cache_not_found(missing - set(records))
+        return records
+
+    @classmethod
+    async def aget_many(cls: Type[T], record_ids: List[Union[str, int]]) -> Dict:
+        records, missing = cls._get_many_from_cache(record_ids)
+        if missing:
+            many_id_lookup = getattr(cls._meta, "many_id_lookup", None)
+            if many_id_lookup:
+
+                async def fetch(chunk):
+                    manager = cls.objects.filter(**{many_id_lookup: ",".join(map(str, chunk))})
+                    return [item async for item in manager.aiterator()]
+
+                results = await asyncio.gather(*map(fetch, cls._chunk_missing_ids(missing)))
             else:
-                for missing_id in missing:
-                    records[missing_id] = cls.objects.get(pk=missing_id)
+                client = cls.objects._get_async_client()
+                results = await asyncio.gather(
+                    *(cls.objects.aget(pk=missing_id, client=client) for missing_id in missing)
+                )
+                results = [[item] for item in results]
+            for items in results:
+                records.update({item.id: remember(item) for item in items})
+            cls.cache_not_found(missing - set(records))
         return records
 
     def cache(self: T) -> T:
         cache_expiration = getattr(self._meta, "cache_expiration", 24 * 60 * 60)
-        cache.set(
-            self.cache_key(self.pk),
-            self,
-            timeout=cache_expiration,
-        )
+        cache_set_many(self.__class__, {self.cache_key(self.pk): self}, cache_expiration)
         return self
 
     @classmethod
     def cache_many(cls: Type[T], instances: List[T]) -> List[T]:
         cache_expiration = getattr(cls._meta, "cache_expiration", 24 * 60 * 60)
-        cache.set_many(
-            {instance.cache_key(instance.pk): instance for instance in instances}, cache_expiration
+        cache_set_many(
+            cls,
+            {instance.cache_key(instance.pk): instance for instance in instances},
+            cache_expiration,
         )
         return instances
 
+    @classmethod
+    def cache_not_found(cls: Type[T], pks: Iterable[Union[str, int]]) -> None:
+        cache_set_not_found(cls, [cls.cache_key(pk) for pk in pks])
+
     def refresh_from_api(self: T) -> None:
         fresh = self.objects.get(pk=self.pk, ignore_cache=True)
-        self.__dict__ = fresh.__dict__
+        if fresh is not self:
+            self._set_state(fresh._get_state())
         self.cache()
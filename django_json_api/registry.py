@@ -0,0 +1,22 @@
+from typing import Dict, Optional, Type
+
+_models: Dict[str, Type] = {}
+
+
+def register(model: Type) -> None:
+    resource_type = model._meta.resource_type
+    registered = _models.get(resource_type)
+    if registered is not None and (registered.__module__, registered.__qualname__) != (
+        model.__module__,
+        model.__qualname__,
+    ):
+        raise RuntimeError(
+            f'Conflicting "{resource_type}" models: '
+            f"{registered.__module__}.{registered.__qualname__} and "
+            f"{model.__module__}.{model.__qualname__}."
+        )
+    _models[resource_type] = model
+
+
+def get_model(resource_type: str) -> Optional[Type]:
+    return _models.get(resource_type)
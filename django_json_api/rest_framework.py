@@ -7,11 +7,36 @@ from rest_framework_json_api.utils import get_included_resources, get_resource_t
 from django_json_api import django, fields
 from django_json_api.client import JSONAPIClientError
 
+
+class EnumField(serializers.ChoiceField):
+    def __init__(self, enum, **kwargs):
+        self.enum = enum
+        super().__init__(choices=[(member.value, member.name) for member in enum], **kwargs)
+
+    def to_representation(self, value):
+        if isinstance(value, self.enum):
+            return value.value
+        return super().to_representation(value)
+
+
 MAPPING = {
     fields.DateTimeAttribute: serializers.DateTimeField,
+    fields.DateAttribute: serializers.DateField,
+    fields.IntegerAttribute: serializers.IntegerField,
+    fields.DecimalAttribute: serializers.DecimalField,
+    fields.UUIDAttribute: serializers.UUIDField,
+    fields.EnumAttribute: EnumField,
 }
 
 
+def get_field_kwargs(field):
+    if isinstance(field, fields.DecimalAttribute):
+        return {"max_digits": field.max_digits, "decimal_places": field.decimal_places}
+    if isinstance(field, fields.EnumAttribute):
+        return {"enum": field.enum}
+    return {}
+
+
 class SparseFieldsetsMixin(serializers.SparseFieldsetsMixin):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -45,10 +70,12 @@ def get_default_relation_serializer(json_api_model, only_fields=None):
                     and not isinstance(field, fields.Relationship)
                     and (only_fields is None or fieldname in only_fields)
                 ):
-                    new_class._declared_fields[fieldname] = MAPPING.get(
-                        field.__class__,
-                        serializers.ReadOnlyField,
-                    )(read_only=True)
+                    serializer_field = MAPPING.get(field.__class__)
+                    new_class._declared_fields[fieldname] = (
+                        serializer_field(read_only=True, **get_field_kwargs(field))
+                        if serializer_field is not None
+                        else serializers.ReadOnlyField(read_only=True)
+                    )
             return new_class
 
     class _Serializer(
@@ -101,6 +128,7 @@ class ModelSerializer(
         try:
             return super().is_valid(raise_exception)
         except JSONAPIClientError as exception:
-            if exception.response.status_code == HTTP_404_NOT_FOUND:
+            response = exception.response
+            if response is not None and response.status_code == HTTP_404_NOT_FOUND:
                 raise ValidationError("Failed to fetch RelatedJSONAPIField")
             raise exception
@@ -0,0 +1,90 @@
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Tuple
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def read_more(self) -> bool:
+        if self.exhausted:
+            return False
+        if self.pos > len(self.text) // 2:
+            self.text = self.text[self.pos :]
+            self.pos = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.text += text
+                return True
+        self.text += self.decoder.decode(b"", final=True)
+        self.exhausted = True
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read_more():
+                raise json.JSONDecodeError("Unexpected end of document", self.text, self.pos)
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise json.JSONDecodeError(f"Expected one of {characters!r}", self.text, self.pos)
+        self.pos += 1
+        return character
+
+    def decode_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.read_more():
+                    raise
+                continue
+            # A number at the very end of the buffer may still be incomplete
+            if end == len(self.text) and not self.exhausted:
+                self.read_more()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_document(
+    chunks: Iterable[bytes], streamed_members: Tuple[str, ...] = ("data", "included")
+) -> Iterator[Tuple[str, Any]]:
+    # Yields (member, value) for each top-level member of the document, arrays under
+    # `streamed_members` being yielded one item at a time as soon as each item is decoded.
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        member = buffer.decode_value()
+        buffer.expect(":")
+        if member in streamed_members and buffer.peek() == "[":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.expect("]")
+            else:
+                while True:
+                    yield member, buffer.decode_value()
+                    if buffer.expect(",]") == "]":
+                        break
+        else:
+            yield member, buffer.decode_value()
+        if buffer.expect(",}") == "}":
+            return
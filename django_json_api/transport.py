@@ -0,0 +1,29 @@
+from threading import Lock
+from typing import Dict
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_adapters: Dict[str, HTTPAdapter] = {}
+_adapters_lock = Lock()
+
+
+def get_adapter(api_url: str) -> HTTPAdapter:
+    adapter = _adapters.get(api_url)
+    if adapter is None:
+        with _adapters_lock:
+            adapter = _adapters.get(api_url)
+            if adapter is None:
+                adapter = _adapters[api_url] = HTTPAdapter(
+                    pool_connections=getattr(settings, "DJANGO_JSON_API_POOL_CONNECTIONS", 10),
+                    pool_maxsize=getattr(settings, "DJANGO_JSON_API_POOL_MAXSIZE", 10),
+                    pool_block=getattr(settings, "DJANGO_JSON_API_POOL_BLOCK", False),
+                )
+    return adapter
+
+
+def close_adapters() -> None:
+    with _adapters_lock:
+        for adapter in _adapters.values():
+            adapter.close()
+        _adapters.clear()
@@ -23,7 +23,7 @@ setup(
     author="Sharework",
     author_email="root@sharework.co",
     description="JSON API specification for Django services",
-    extras_require={"all": dev_deps, "dev": dev_deps},
+    extras_require={"all": dev_deps, "async": ["httpx"], "dev": dev_deps},
     install_requires=core_deps,
     long_description=long_description,
     long_description_content_type="text/markdown",
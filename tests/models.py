@@ -22,6 +22,40 @@ class DummyRelated(models.JSONAPIModel):
     other_related = fields.Relationship()
 
 
+class LazyDummy(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "lazy_tests"
+        lazy_attributes = True
+
+    name = fields.Attribute()
+    created_at = fields.DateTimeAttribute()
+    renamed = fields.Attribute(name="label")
+    owner = fields.Relationship()
+
+
+class CompactDummy(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "compact_tests"
+        compact = True
+
+    name = fields.Attribute()
+    renamed = fields.Attribute(name="label")
+    owner = fields.Relationship()
+    members = fields.Relationship(many=True)
+
+
 class DummyModel(Model):
     related = django.RelatedJSONAPIField(DummyRelated)
     other = django.RelatedJSONAPIField(DummyRelated, null=True)
+
+
+class Renamed(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "renamed_tests"
+        cache_format = "compact"
+
+    renamed = fields.Attribute(name="label")
+    renamed_related = fields.Relationship(name="owner")
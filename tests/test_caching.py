@@ -0,0 +1,346 @@
+import math
+import threading
+import time
+from unittest import mock
+
+import pytest
+import requests_mock
+from django.core.cache import cache
+from django.test import override_settings
+from requests_mock.mocker import Mocker
+
+from django_json_api.caching import (
+    NOT_FOUND,
+    CacheEntry,
+    LocalCache,
+    _refreshing,
+    _schemas,
+    cache_lock,
+    get_local_cache,
+    get_schema,
+    schedule_refresh,
+)
+from tests.models import Dummy, DummyRelated, LazyDummy, Renamed
+
+
+@pytest.fixture
+def local_cache():
+    cache.clear()
+    get_local_cache().clear()
+    Dummy._meta.local_cache_timeout = 60
+    yield get_local_cache()
+    delattr(Dummy._meta, "local_cache_timeout")
+    get_local_cache().clear()
+    cache.clear()
+
+
+def test_local_cache_get_many():
+    local_cache = LocalCache(max_entries=10, max_bytes=1024)
+    local_cache.set_many({"a": {"value": 1}, "b": [2]}, timeout=60)
+    values = local_cache.get_many(["a", "b", "c"])
+    assert values == {"a": {"value": 1}, "b": [2]}
+    assert values["a"] is not local_cache.get_many(["a"])["a"]
+    assert local_cache.stats() == {
+        "hits": 3,
+        "misses": 1,
+        "entries": 2,
+        "bytes": local_cache.size,
+    }
+
+
+def test_local_cache_expiration():
+    local_cache = LocalCache(max_entries=10, max_bytes=1024)
+    local_cache.set_many({"a": 1}, timeout=0.01)
+    time.sleep(0.01)
+    assert local_cache.get_many(["a"]) == {}
+    assert len(local_cache) == 0
+    assert local_cache.size == 0
+
+
+def test_local_cache_lru_eviction():
+    local_cache = LocalCache(max_entries=2, max_bytes=1024)
+    local_cache.set_many({"a": 1, "b": 2}, timeout=60)
+    local_cache.get_many(["a"])
+    local_cache.set_many({"c": 3}, timeout=60)
+    assert local_cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_local_cache_max_bytes():
+    local_cache = LocalCache(max_entries=10, max_bytes=120)
+    local_cache.set_many({"a": "a" * 40, "b": "b" * 40}, timeout=60)
+    assert len(local_cache) == 2
+    local_cache.set_many({"c": "c" * 40}, timeout=60)
+    assert list(local_cache.get_many(["a", "b", "c"])) == ["b", "c"]
+    assert local_cache.size <= 120
+    local_cache.set_many({"d": "d" * 200}, timeout=60)
+    assert local_cache.get_many(["d"]) == {}
+    local_cache.delete_many(["b", "c"])
+    assert local_cache.size == 0
+
+
+def test_model_cache_populates_local_cache(local_cache):
+    record = Dummy(pk=12, field="Cached").cache()
+    cache.clear()
+    assert Dummy.from_cache(12) == record
+    assert Dummy.from_cache(12) is not record
+    assert Dummy.from_cache(12).field == "Cached"
+    assert Dummy.get_many([12]) == {12: record}
+    assert local_cache.hits == 4
+
+
+def test_model_from_cache_reads_through_local_cache(local_cache):
+    cache.set(Dummy.cache_key(12), Dummy(pk=12, field="Shared"))
+    assert Dummy.from_cache(12).field == "Shared"
+    assert local_cache.misses == 1
+    cache.clear()
+    assert Dummy.from_cache(12).field == "Shared"
+    assert local_cache.hits == 1
+
+
+def test_model_without_local_cache():
+    get_local_cache().clear()
+    Dummy(pk=12).cache()
+    assert Dummy.from_cache(12) is not None
+    assert get_local_cache().stats() == {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+    cache.clear()
+
+
+@pytest.fixture
+def compact_cache():
+    cache.clear()
+    Dummy._meta.cache_format = "compact"
+    yield
+    delattr(Dummy._meta, "cache_format")
+    cache.clear()
+
+
+def test_pickled_record_excludes_resolved_relationships():
+    record = Dummy(pk=12, related={"id": "13", "type": "tests"})
+    record._related_cache = Dummy(pk=13)
+    record.cache()
+    cached = Dummy.from_cache(12)
+    assert "_related_cache" not in cached.__dict__
+    assert cached.related_identifier == {"id": "13", "type": "tests"}
+    cache.clear()
+
+
+def test_compact_cache_format(compact_cache):
+    record = Dummy(pk=12, field={"nested": 1}, related={"id": "13", "type": "tests"})
+    record._related_cache = Dummy(pk=13)
+    record.cache()
+    assert cache.get(Dummy.cache_key(12)) == (
+        get_schema(Dummy),
+        (12, ({"nested": 1}, ("tests", "13"))),
+    )
+    cached = Dummy.from_cache(12)
+    assert cached == record
+    assert cached.field == {"nested": 1}
+    assert cached.related_identifier == {"id": "13", "type": "tests"}
+    assert "_related_cache" not in cached.__dict__
+
+
+def test_compact_cache_format_absent_values(compact_cache):
+    Dummy(pk=12, related=None).cache()
+    Dummy(pk=13).cache()
+    records = Dummy.get_many([12, 13])
+    assert records[12].related_identifier is None
+    assert "field" not in records[12].__dict__
+    assert not hasattr(records[13], "related_identifier")
+
+
+def test_compact_cache_format_renamed_fields(compact_cache):
+    Renamed(pk=12, renamed="Label", renamed_related={"id": "13", "type": "tests"}).cache()
+    cached = Renamed.from_cache(12)
+    assert cached.renamed == "Label"
+    assert cached.owner_identifier == {"id": "13", "type": "tests"}
+
+
+def test_compact_cache_format_to_many(compact_cache):
+    record = DummyRelated(pk=1, name="Name")
+    DummyRelated._meta.cache_format = "compact"
+    DummyRelated._meta.fields["other_related"].many = True
+    _schemas.pop(DummyRelated, None)
+    try:
+        record.other_related = [{"id": "2", "type": "related_records"}]
+        record.cache()
+        cached = DummyRelated.from_cache(1)
+        assert cached.other_related_identifiers == [{"id": "2", "type": "related_records"}]
+    finally:
+        DummyRelated._meta.fields["other_related"].many = False
+        delattr(DummyRelated._meta, "cache_format")
+        _schemas.pop(DummyRelated, None)
+
+
+def test_compact_cache_format_schema_version(compact_cache):
+    Dummy(pk=12, field="Cached").cache()
+    Dummy._meta.cache_version = 2
+    _schemas.pop(Dummy, None)
+    try:
+        assert Dummy.from_cache(12) is None
+        cache.set(Dummy.cache_key(13), Dummy(pk=13))
+        assert Dummy.from_cache(13) is None
+    finally:
+        delattr(Dummy._meta, "cache_version")
+        _schemas.pop(Dummy, None)
+    assert Dummy.from_cache(12).field == "Cached"
+
+
+def test_compact_cache_format_switched_off(compact_cache):
+    Dummy(pk=12, field="Cached").cache()
+    with mock.patch.object(Dummy._meta, "cache_format", "pickle"):
+        assert Dummy.from_cache(12) is None
+        assert Dummy._get_many_from_cache([12]) == ({}, {12})
+        Dummy(pk=12, field="Pickled").cache()
+        assert Dummy.from_cache(12).field == "Pickled"
+    assert Dummy.from_cache(12) is None
+
+
+@override_settings(DJANGO_JSON_API_CACHE_COMPRESS_THRESHOLD=100)
+def test_compact_cache_format_compression(compact_cache):
+    Dummy(pk=12, field="small").cache()
+    Dummy(pk=13, field="large" * 100).cache()
+    assert not isinstance(cache.get(Dummy.cache_key(12))[1], bytes)
+    compressed = cache.get(Dummy.cache_key(13))[1]
+    assert isinstance(compressed, bytes)
+    assert len(compressed) < 100
+    assert Dummy.from_cache(12).field == "small"
+    assert Dummy.from_cache(13).field == "large" * 100
+
+
+def test_compact_cache_format_not_found(compact_cache):
+    Dummy._meta.negative_cache_expiration = 60
+    Dummy.cache_not_found([12])
+    delattr(Dummy._meta, "negative_cache_expiration")
+    assert cache.get(Dummy.cache_key(12)) == NOT_FOUND
+    assert Dummy._from_cache(12) == NOT_FOUND
+    assert Dummy.from_cache(12) is None
+
+
+@pytest.fixture
+def soft_expiration():
+    cache.clear()
+    Dummy._meta.cache_soft_expiration = 60
+    yield
+    delattr(Dummy._meta, "cache_soft_expiration")
+    cache.clear()
+
+
+def wait_for_refreshes():
+    for future in list(_refreshing.values()):
+        future.result()
+
+
+def test_stale_record_is_refreshed_in_background(soft_expiration):
+    Dummy(pk=12, field="Stale").cache()
+    assert isinstance(cache.get(Dummy.cache_key(12)), CacheEntry)
+    with Mocker() as mocker:
+        mocker.register_uri(
+            "GET",
+            requests_mock.ANY,
+            json={"data": {"id": "12", "type": "tests", "attributes": {"field": "Fresh"}}},
+        )
+        assert Dummy.objects.get(pk=12).field == "Stale"
+        assert not mocker.called
+        with mock.patch("time.time", return_value=time.time() + 120):
+            assert Dummy.objects.get(pk=12).field == "Stale"
+        wait_for_refreshes()
+        assert mocker.call_count == 1
+        assert Dummy.objects.get(pk=12).field == "Fresh"
+
+
+def test_get_many_revalidates_stale_records(soft_expiration):
+    Dummy(pk=12, field="Stale").cache()
+    Dummy(pk=13, field="Fresh").cache()
+    cache.set(Dummy.cache_key(12), CacheEntry(Dummy(pk=12, field="Stale"), time.time() - 1))
+    with mock.patch("django_json_api.models.schedule_refresh") as schedule:
+        records = Dummy.get_many([12, 13])
+        assert records[12].field == "Stale"
+        schedule.assert_called_once_with(Dummy.cache_key(12), mock.ANY)
+        Dummy.from_cache(12, revalidate=False)
+        assert schedule.call_count == 1
+
+
+def test_schedule_refresh_runs_once_per_key():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+
+    schedule_refresh("key", refresh)
+    started.wait(1)
+    schedule_refresh("key", refresh)
+    release.set()
+    wait_for_refreshes()
+    assert calls == [1]
+    schedule_refresh("key", lambda: calls.append(2))
+    wait_for_refreshes()
+    assert calls == [1, 2]
+
+
+def test_cache_entry_early_expiration():
+    now = time.time()
+    entry = CacheEntry("value", math.inf, now + 10)
+    assert not entry.is_stale(now)
+    with mock.patch("random.random", return_value=0.5):
+        assert not entry.is_stale(now, early_expiration=1)
+        assert entry.is_stale(now + 9.5, early_expiration=1)
+    with mock.patch("random.random", return_value=0.9999):
+        assert entry.is_stale(now, early_expiration=2)
+    assert CacheEntry("value", now).is_stale(now)
+
+
+def test_early_expiration_wraps_records():
+    cache.clear()
+    Dummy._meta.cache_early_expiration = 5
+    Dummy(pk=12).cache()
+    entry = cache.get(Dummy.cache_key(12))
+    assert entry.fresh_until == math.inf
+    assert entry.expires_at == pytest.approx(time.time() + 24 * 60 * 60, abs=5)
+    with mock.patch("django_json_api.models.schedule_refresh") as schedule:
+        with mock.patch("time.time", return_value=entry.expires_at):
+            assert Dummy.from_cache(12) == Dummy(pk=12)
+        schedule.assert_called_once_with(Dummy.cache_key(12), mock.ANY)
+    delattr(Dummy._meta, "cache_early_expiration")
+    cache.clear()
+
+
+def test_cache_lock():
+    cache.clear()
+    with cache_lock("key", 10) as acquired:
+        assert acquired
+        with cache_lock("key", 10) as acquired_again:
+            assert not acquired_again
+        assert cache.get("key:lock")
+    assert cache.get("key:lock") is None
+    with cache_lock("key", None) as acquired:
+        assert acquired
+        assert cache.get("key:lock") is None
+
+
+def test_background_refresh_skipped_when_locked():
+    cache.clear()
+    Dummy._meta.cache_lock_timeout = 10
+    with mock.patch.object(Dummy, "objects") as objects:
+        with cache_lock(Dummy.cache_key(12), 10):
+            Dummy._refresh_cache(12)
+        objects.get.assert_not_called()
+        Dummy._refresh_cache(12)
+        objects.get.assert_called_once_with(pk=12, ignore_cache=True)
+    delattr(Dummy._meta, "cache_lock_timeout")
+
+
+def test_compact_cache_format_lazy_attributes(compact_cache):
+    LazyDummy._meta.cache_format = "compact"
+    try:
+        record = LazyDummy._meta.deserialize(
+            {"id": "12", "attributes": {"name": "Name", "created_at": "2021-02-24T12:34:56Z"}}
+        )
+        record.cache()
+        cached = LazyDummy.from_cache(12)
+        assert cached.__dict__ == {"pk": 12, "name": "Name", "created_at": record.created_at}
+        assert cached.created_at.year == 2021
+    finally:
+        delattr(LazyDummy._meta, "cache_format")
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from unittest import mock
+
+import httpx
+import pytest
+import requests
+import requests_mock
+from django.core.cache import cache
+from django.test import override_settings
+
+from django_json_api.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    circuit_breaker_state_changed,
+    get_circuit_breaker,
+    reset_circuit_breakers,
+)
+from django_json_api.client import (
+    AsyncJSONAPIClient,
+    JSONAPICircuitOpenError,
+    JSONAPIClient,
+    JSONAPIClientError,
+)
+from tests.models import Dummy
+
+
+@pytest.fixture(autouse=True)
+def circuit_breakers():
+    reset_circuit_breakers()
+    with override_settings(
+        DJANGO_JSON_API_CIRCUIT_BREAKER_THRESHOLD=2,
+        DJANGO_JSON_API_CIRCUIT_BREAKER_RESET_TIMEOUT=60,
+    ):
+        yield
+    reset_circuit_breakers()
+
+
+@pytest.fixture
+def state_changes():
+    receiver = mock.Mock()
+    circuit_breaker_state_changed.connect(receiver)
+    yield receiver
+    circuit_breaker_state_changed.disconnect(receiver)
+
+
+def test_circuit_breaker_states(state_changes):
+    circuit_breaker = CircuitBreaker("http://test/api", failure_threshold=2, reset_timeout=0.05)
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CLOSED
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CLOSED
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == OPEN
+    assert not circuit_breaker.allow_request()
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == HALF_OPEN
+    assert not circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == OPEN
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == CLOSED
+    assert [call.kwargs["state"] for call in state_changes.call_args_list] == [
+        OPEN,
+        HALF_OPEN,
+        OPEN,
+        HALF_OPEN,
+        CLOSED,
+    ]
+    state_changes.assert_called_with(
+        signal=circuit_breaker_state_changed,
+        sender=CircuitBreaker,
+        api_url="http://test/api",
+        previous_state=HALF_OPEN,
+        state=CLOSED,
+    )
+
+
+def test_circuit_breaker_trial_timeout():
+    circuit_breaker = CircuitBreaker("http://test/api", failure_threshold=1, reset_timeout=0.05)
+    circuit_breaker.record_failure()
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+    # The trial never ended
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == HALF_OPEN
+
+
+def test_circuit_breaker_aborted_trial():
+    circuit_breaker = CircuitBreaker("http://test/api", failure_threshold=1, reset_timeout=60)
+    circuit_breaker.record_abort()
+    assert circuit_breaker.state == CLOSED
+    circuit_breaker.record_failure()
+    circuit_breaker.opened_at -= 60
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_abort()
+    assert circuit_breaker.state == OPEN
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == HALF_OPEN
+
+
+def test_get_circuit_breaker():
+    assert get_circuit_breaker("http://test/api") is get_circuit_breaker("http://test/api")
+    assert get_circuit_breaker("http://test/api").failure_threshold == 2
+    with override_settings(DJANGO_JSON_API_CIRCUIT_BREAKER_THRESHOLD=None):
+        assert get_circuit_breaker("http://test/api") is None
+
+
+def test_jsonapi_client_fails_fast_when_open():
+    with requests_mock.Mocker() as mocker:
+        mocker.get(requests_mock.ANY, exc=requests.ConnectionError)
+        for _ in range(2):
+            with pytest.raises(JSONAPIClientError, match="Request Error"):
+                JSONAPIClient().get("tests")
+        with pytest.raises(JSONAPICircuitOpenError, match="http://test/api"):
+            JSONAPIClient().get("tests")
+        assert mocker.call_count == 2
+        # Other upstreams are not affected
+        mocker.get("http://example.com/related-records/", json={})
+        JSONAPIClient().get("related_records")
+
+
+def test_jsonapi_client_counts_server_errors_only():
+    with requests_mock.Mocker() as mocker:
+        mocker.get(requests_mock.ANY, status_code=404)
+        for _ in range(3):
+            with pytest.raises(JSONAPIClientError, match="HTTP Error: 404"):
+                JSONAPIClient().get("tests")
+        mocker.get(requests_mock.ANY, status_code=500)
+        for _ in range(2):
+            with pytest.raises(JSONAPIClientError, match="HTTP Error: 500"):
+                JSONAPIClient().get("tests")
+    assert get_circuit_breaker("http://test/api").state == OPEN
+
+
+def test_jsonapi_manager_get_circuit_breaker_fallback():
+    cache.clear()
+    cached = Dummy(pk=12, field="Cached").cache()
+    get_circuit_breaker("http://test/api").state = OPEN
+    get_circuit_breaker("http://test/api").opened_at = time.monotonic()
+    with pytest.raises(JSONAPICircuitOpenError):
+        Dummy.objects.get(pk=12, ignore_cache=True)
+    with pytest.raises(JSONAPICircuitOpenError):
+        Dummy.objects.get(pk=13)
+    Dummy._meta.circuit_breaker_fallback = True
+    assert Dummy.objects.get(pk=12, ignore_cache=True) == cached
+    with pytest.raises(JSONAPICircuitOpenError):
+        Dummy.objects.get(pk=13)
+    delattr(Dummy._meta, "circuit_breaker_fallback")
+    cache.clear()
+
+
+def test_circuit_breaker_ignores_exceeded_deadlines():
+    client = JSONAPIClient(deadline=time.monotonic())
+    with requests_mock.Mocker() as mocker:
+        mocker.get(requests_mock.ANY, status_code=200, json={})
+        for _ in range(3):
+            with pytest.raises(JSONAPIClientError, match="Deadline exceeded"):
+                client.get("tests", resource_id=1)
+        assert not mocker.called
+    circuit_breaker = get_circuit_breaker(Dummy._meta.api_url)
+    assert circuit_breaker.state == CLOSED
+    assert circuit_breaker.failures == 0
+
+
+def test_async_jsonapi_client_cancelled_trial():
+    circuit_breaker = get_circuit_breaker("http://test/api")
+    circuit_breaker.state = OPEN
+    circuit_breaker.opened_at = time.monotonic() - 60
+
+    async def handler(request):
+        if not calls:
+            calls.append(request)
+            await asyncio.sleep(10)
+        calls.append(request)
+        return httpx.Response(200, json={"data": None})
+
+    async def fetch():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as session:
+            client = AsyncJSONAPIClient(session=session)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.get("tests", resource_id=1), 0.05)
+            assert circuit_breaker.state == OPEN
+            return await client.get("tests", resource_id=1)
+
+    calls = []
+    assert asyncio.run(fetch()) == {"data": None}
+    assert len(calls) == 2
+    assert circuit_breaker.state == CLOSED
@@ -1,11 +1,32 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
 from urllib.parse import urlencode
 
 import pytest
+import requests
 import requests_mock
 from django.conf import settings
+from django.core.cache import cache
 from django.test import override_settings
 
-from django_json_api.client import JSONAPIClient, JSONAPIClientError
+from django_json_api.client import (
+    AsyncJSONAPIClient,
+    JSONAPIClient,
+    JSONAPIClientError,
+    SingleFlight,
+    close_async_sessions,
+    get_async_session,
+    get_json_decoder,
+    parse_retry_after,
+)
+from tests.models import DummyRelated
+from tests.utils import mock_async_transport
 
 
 @pytest.fixture
@@ -179,3 +200,309 @@ def test_jsonapi_get_unresolved_resource():
     client = JSONAPIClient()
     with pytest.raises(JSONAPIClientError, match=r'Cannot resolve resource "unresolvable"'):
         client.get("unresolvable")
+
+
+def test_async_jsonapi_client_get():
+    expected_params = {
+        "fields[related_records]": "name,other_related",
+        "include": "other_related",
+    }
+    url = f"http://example.com/related-records/42/?{urlencode(expected_params)}"
+
+    async def fetch():
+        async with AsyncJSONAPIClient() as client:
+            assert client.session.headers["Accept"] == "application/vnd.api+json"
+            return await client.get("related_records", resource_id=42)
+
+    with mock_async_transport({url: {"data": None}}) as requested:
+        assert asyncio.run(fetch()) == {"data": None}
+    assert requested == [url]
+
+
+def test_async_jsonapi_client_get_handles_http_errors():
+    async def fetch():
+        async with AsyncJSONAPIClient() as client:
+            return await client.get("related_records")
+
+    with mock_async_transport({}):
+        with pytest.raises(JSONAPIClientError) as excinfo:
+            asyncio.run(fetch())
+    assert excinfo.value.response.status_code == 404
+
+
+def test_jsonapi_client_get_url_stays_on_api_url(mock_requests):
+    mock_requests.get(requests_mock.ANY, json={})
+    client = JSONAPIClient()
+    assert client.get_url("related_records", "?page%5Bcursor%5D=abc") == {}
+    assert client.get_url("related_records", "http://example.com/related-records/") == {}
+    for url in [
+        "https://evil.example/related-records/",
+        "//evil.example/related-records/",
+        "https://example.com/related-records/",
+    ]:
+        with pytest.raises(JSONAPIClientError, match="Refusing to follow"):
+            client.get_url("related_records", url)
+        with pytest.raises(JSONAPIClientError, match="Refusing to follow"):
+            list(client.stream_url("related_records", url))
+    assert mock_requests.call_count == 2
+
+    async def fetch():
+        async with AsyncJSONAPIClient() as async_client:
+            await async_client.get_url("related_records", "https://evil.example/")
+
+    with mock_async_transport({}) as requested:
+        with pytest.raises(JSONAPIClientError, match="Refusing to follow"):
+            asyncio.run(fetch())
+    assert requested == []
+
+
+def test_async_jsonapi_client_is_not_a_sync_client():
+    client = AsyncJSONAPIClient()
+    assert not isinstance(client, JSONAPIClient)
+    assert not hasattr(client, "stream")
+    assert client.build_url("related_records", resource_id=42).startswith(
+        "http://example.com/related-records/42/?"
+    )
+
+
+def test_async_jsonapi_client_shared_session():
+    url = "http://example.com/related-records/42/"
+
+    async def fetch():
+        session = get_async_session("http://example.com")
+        assert get_async_session("http://example.com") is session
+        async with AsyncJSONAPIClient(session=session) as client:
+            client.headers["X-No-Count"] = "true"
+            await client.get_url("related_records", url)
+        assert not session.is_closed
+        assert "X-No-Count" not in session.headers
+        await close_async_sessions()
+        assert session.is_closed
+        assert get_async_session("http://example.com") is not session
+        await close_async_sessions()
+
+    with mock_async_transport({url: {"data": None}}) as requested:
+        asyncio.run(fetch())
+    assert requested == [url]
+
+
+@pytest.fixture
+def conditional_requests():
+    cache.clear()
+    DummyRelated._meta.conditional_requests = True
+    yield
+    delattr(DummyRelated._meta, "conditional_requests")
+    cache.clear()
+
+
+def test_jsonapi_client_get_revalidates_with_etag(mock_requests, conditional_requests):
+    document = {"data": {"id": "42", "type": "related_records", "attributes": {"name": "Test"}}}
+    mock_requests.get(
+        requests_mock.ANY,
+        [
+            {"json": document, "headers": {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct"}},
+            {"status_code": 304},
+        ],
+    )
+    client = JSONAPIClient()
+    assert client.get("related_records", resource_id=42) == document
+    assert "If-None-Match" not in mock_requests.last_request.headers
+    assert client.get("related_records", resource_id=42) == document
+    assert mock_requests.last_request.headers["If-None-Match"] == '"v1"'
+    assert mock_requests.last_request.headers["If-Modified-Since"] == "Wed, 21 Oct"
+    assert mock_requests.call_count == 2
+
+
+def test_jsonapi_client_get_without_validators(mock_requests, conditional_requests):
+    mock_requests.get(requests_mock.ANY, json={"data": []})
+    client = JSONAPIClient()
+    client.get("related_records")
+    client.get("related_records")
+    assert "If-None-Match" not in mock_requests.last_request.headers
+    assert "If-Modified-Since" not in mock_requests.last_request.headers
+
+
+def test_jsonapi_client_get_conditional_requests_disabled(mock_requests):
+    cache.clear()
+    mock_requests.get(requests_mock.ANY, json={"data": []}, headers={"ETag": '"v1"'})
+    client = JSONAPIClient()
+    client.get("related_records")
+    client.get("related_records")
+    assert "If-None-Match" not in mock_requests.last_request.headers
+
+
+def test_jsonapi_client_stream(mock_requests):
+    document = {"data": [{"id": "1", "type": "related_records"}], "links": {"next": None}}
+    mock_requests.get(requests_mock.ANY, json=document)
+    events = list(JSONAPIClient().stream("related_records", page_number=2))
+    assert events == [("data", document["data"][0]), ("links", {"next": None})]
+    assert "page%5Bnumber%5D=2" in mock_requests.last_request.url
+
+
+def test_jsonapi_client_stream_handles_http_errors(mock_requests):
+    mock_requests.get(requests_mock.ANY, status_code=500)
+    with pytest.raises(JSONAPIClientError):
+        list(JSONAPIClient().stream("related_records"))
+
+
+DECODED = []
+
+
+def recording_decoder(content):
+    DECODED.append(content)
+    return json.loads(content)
+
+
+@override_settings(DJANGO_JSON_API_JSON_DECODER="tests.test_client.recording_decoder")
+def test_jsonapi_client_get_with_custom_json_decoder(mock_requests):
+    DECODED.clear()
+    mock_requests.get(requests_mock.ANY, json={"data": []})
+    assert JSONAPIClient().get("related_records") == {"data": []}
+    assert DECODED == [b'{"data": []}']
+
+
+def test_get_json_decoder():
+    assert get_json_decoder() is json.loads
+    with override_settings(DJANGO_JSON_API_JSON_DECODER="tests.test_client.recording_decoder"):
+        assert get_json_decoder() is recording_decoder
+
+
+def test_single_flight_shares_result_and_errors():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def function():
+        calls.append(1)
+        release.wait()
+        return {"data": []}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.do, "key", function) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert single_flight._calls == {}
+
+    with pytest.raises(ValueError):
+        single_flight.do("key", mock.Mock(side_effect=ValueError))
+
+
+def test_jsonapi_client_get_single_flight(mock_requests):
+    def slow_response(request, context):
+        time.sleep(0.2)
+        return {"data": []}
+
+    mock_requests.get(requests_mock.ANY, json=slow_response)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(JSONAPIClient().get, "related_records") for _ in range(4)]
+        assert [future.result() for future in futures] == [{"data": []}] * 4
+    assert mock_requests.call_count == 1
+
+
+@override_settings(DJANGO_JSON_API_SINGLE_FLIGHT=False)
+def test_jsonapi_client_get_single_flight_disabled(mock_requests):
+    def slow_response(request, context):
+        time.sleep(0.1)
+        return {"data": []}
+
+    mock_requests.get(requests_mock.ANY, json=slow_response)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(JSONAPIClient().get, "related_records") for _ in range(4)]
+        [future.result() for future in futures]
+    assert mock_requests.call_count == 4
+
+
+def test_jsonapi_client_get_timeout(mock_requests):
+    mock_requests.get(requests_mock.ANY, json={})
+    JSONAPIClient().get("related_records")
+    assert mock_requests.last_request.timeout == (5, 30)
+    with override_settings(DJANGO_JSON_API_TIMEOUT=2):
+        JSONAPIClient().get("related_records")
+        assert mock_requests.last_request.timeout == 2
+        DummyRelated._meta.timeout = (1, 10)
+        JSONAPIClient().get("related_records")
+        delattr(DummyRelated._meta, "timeout")
+        assert mock_requests.last_request.timeout == (1, 10)
+
+
+def test_jsonapi_client_get_deadline(mock_requests):
+    mock_requests.get(requests_mock.ANY, json={})
+    client = JSONAPIClient(deadline=time.monotonic() + 1)
+    client.get("related_records")
+    connect, read = mock_requests.last_request.timeout
+    assert 0 < connect <= 1 and 0 < read <= 1
+    client.deadline = time.monotonic()
+    with pytest.raises(JSONAPIClientError, match="Deadline exceeded"):
+        client.get("related_records", page_number=2)
+
+
+def test_jsonapi_client_get_wraps_request_errors(mock_requests):
+    mock_requests.get(requests_mock.ANY, exc=requests.ConnectTimeout)
+    with pytest.raises(JSONAPIClientError, match="Request Error") as excinfo:
+        JSONAPIClient().get("related_records")
+    assert excinfo.value.response is None
+    assert mock_requests.call_count == 1
+
+
+@override_settings(DJANGO_JSON_API_RETRIES=2, DJANGO_JSON_API_RETRY_BACKOFF=0.01)
+def test_jsonapi_client_get_retries(mock_requests):
+    mock_requests.get(
+        requests_mock.ANY,
+        [
+            {"exc": requests.ConnectionError},
+            {"status_code": 503, "headers": {"Retry-After": "0"}},
+            {"json": {"data": []}},
+        ],
+    )
+    assert JSONAPIClient().get("related_records") == {"data": []}
+    assert mock_requests.call_count == 3
+
+
+@override_settings(DJANGO_JSON_API_RETRIES=2, DJANGO_JSON_API_RETRY_BACKOFF=0.01)
+def test_jsonapi_client_get_retries_exhausted(mock_requests):
+    mock_requests.get(requests_mock.ANY, status_code=502)
+    with pytest.raises(JSONAPIClientError, match="HTTP Error: 502"):
+        JSONAPIClient().get("related_records")
+    assert mock_requests.call_count == 3
+
+
+@override_settings(DJANGO_JSON_API_RETRIES=2, DJANGO_JSON_API_RETRY_BACKOFF_MAX=10)
+def test_jsonapi_client_get_does_not_wait_beyond_limits(mock_requests):
+    mock_requests.get(requests_mock.ANY, status_code=429, headers={"Retry-After": "3600"})
+    with pytest.raises(JSONAPIClientError, match="HTTP Error: 429"):
+        JSONAPIClient().get("related_records")
+    assert mock_requests.call_count == 1
+    mock_requests.get(requests_mock.ANY, status_code=429, headers={"Retry-After": "5"})
+    with pytest.raises(JSONAPIClientError, match="HTTP Error: 429"):
+        JSONAPIClient(deadline=time.monotonic() + 1).get("related_records")
+    assert mock_requests.call_count == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    in_a_minute = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 0 < parse_retry_after(format_datetime(in_a_minute)) <= 60
+    assert parse_retry_after("soon") is None
+
+
+@override_settings(DJANGO_JSON_API_RETRIES=1, DJANGO_JSON_API_RETRY_BACKOFF=0.01)
+def test_async_jsonapi_client_get_retries():
+    async def fetch():
+        async with AsyncJSONAPIClient() as client:
+            return await client.get("related_records")
+
+    expected_params = {
+        "fields[related_records]": "name,other_related",
+        "include": "other_related",
+    }
+    url = f"http://example.com/related-records/?{urlencode(expected_params)}"
+    with mock_async_transport({url: {}}, status_code=503) as requested:
+        with pytest.raises(JSONAPIClientError, match="HTTP Error: 503"):
+            asyncio.run(fetch())
+    assert len(requested) == 2
@@ -0,0 +1,169 @@
+import threading
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from django_json_api import fields, models
+from django_json_api.deserializer import build_deserializer, build_relationships_check
+from django_json_api.fields import RAW_ATTRIBUTES, DateTimeAttribute
+from tests.models import LazyDummy
+
+
+class Deserialized(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "deserialized"
+
+    name = fields.Attribute()
+    settings = fields.Attribute()
+    owner = fields.Relationship()
+    members = fields.Relationship(many=True)
+
+
+RESOURCE = {
+    "id": "12",
+    "type": "deserialized",
+    "attributes": {"name": "Name", "settings": {1: "one"}, "ignored": True},
+    "relationships": {
+        "owner": {"data": {"id": "1", "type": "users"}},
+        "members": {"data": [{"id": "2", "type": "users"}, None]},
+    },
+}
+
+
+def test_deserialize_matches_init():
+    record = Deserialized._meta.deserialize(RESOURCE)
+    expected = Deserialized(
+        id="12",
+        name="Name",
+        settings={"1": "one"},
+        owner={"id": "1", "type": "users"},
+        members=[{"id": "2", "type": "users"}],
+    )
+    assert type(record) is Deserialized
+    assert record.__dict__ == expected.__dict__
+
+
+def test_deserialize_missing_fields():
+    record = Deserialized._meta.deserialize(
+        {"id": "12", "type": "deserialized", "relationships": {"members": {"data": None}}}
+    )
+    assert record.__dict__ == {"pk": 12, "members_identifiers": []}
+    assert record.name is None
+
+
+def test_deserialize_merges_existing_identifiers():
+    existing = Deserialized(pk=12, name="Old", owner={"id": "1", "type": "users"}, members=[])
+    resource = {
+        "id": "12",
+        "type": "deserialized",
+        "attributes": {"name": "New"},
+        "relationships": {"owner": {"links": {"related": "http://test/api/users/1/"}}},
+    }
+    record = build_deserializer(Deserialized)(resource, existing)
+    assert record.name == "New"
+    assert record.owner_identifier == {"id": "1", "type": "users"}
+    assert record.members_identifiers == []
+
+
+def test_lacks_relationships():
+    lacks_relationships = build_relationships_check(Deserialized)
+    assert not lacks_relationships(RESOURCE)
+    assert lacks_relationships({"id": "1", "relationships": {"owner": {"data": None}}})
+    assert lacks_relationships({"id": "1"})
+
+
+LAZY_RESOURCE = {
+    "id": "12",
+    "type": "lazy_tests",
+    "attributes": {"name": "Name", "created_at": "2021-02-24T12:34:56+00:00", "renamed": "a"},
+    "relationships": {"owner": {"data": {"id": "1", "type": "users"}}},
+}
+
+
+def test_deserialize_lazy_attributes():
+    record = LazyDummy._meta.deserialize(LAZY_RESOURCE)
+    assert record.__dict__ == {
+        "pk": 12,
+        "owner_identifier": {"id": "1", "type": "users"},
+        RAW_ATTRIBUTES: {
+            "name": "Name",
+            "created_at": "2021-02-24T12:34:56+00:00",
+            "label": "a",
+        },
+    }
+    with mock.patch.object(
+        DateTimeAttribute, "clean", autospec=True, side_effect=DateTimeAttribute.clean
+    ) as clean:
+        assert record.created_at == datetime(2021, 2, 24, 12, 34, 56, tzinfo=timezone.utc)
+        assert record.created_at is record.created_at
+        assert clean.call_count == 1
+    assert record.renamed == "a"
+    assert record.__dict__[RAW_ATTRIBUTES] == {"name": "Name"}
+    record.name = "Changed"
+    assert record.name == "Changed"
+
+
+class CompactLazyDummy(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "compact_lazy_tests"
+        compact = True
+        lazy_attributes = True
+
+    name = fields.Attribute()
+
+
+class Interleaved(dict):
+    # Has another thread read `name` right after each lookup of the raw values
+    def __init__(self, record, **values):
+        super().__init__(**values)
+        self.record = record
+        self.interleaved = False
+        self.read = []
+
+    def interleave(self, result):
+        if not self.interleaved:
+            self.interleaved = True
+            thread = threading.Thread(target=lambda: self.read.append(self.record.name))
+            thread.start()
+            thread.join()
+        return result
+
+    def __contains__(self, key):
+        return self.interleave(super().__contains__(key))
+
+    def get(self, key, default=None):
+        return self.interleave(super().get(key, default))
+
+
+@pytest.mark.parametrize("model", [LazyDummy, CompactLazyDummy])
+def test_lazy_attribute_read_concurrently(model):
+    record = model._meta.deserialize({"id": "12", "attributes": {"name": "Name"}})
+    raw = Interleaved(record, name="Name")
+    setattr(record, RAW_ATTRIBUTES, raw)
+    assert record.name == "Name"
+    assert raw.read == ["Name"]
+    assert raw == {}
+
+
+def test_deserialize_renamed_attribute():
+    class Renamed(models.JSONAPIModel):
+        class Meta:
+            api_url = "http://test/api"
+            resource_type = "renamed"
+
+        renamed = fields.Attribute(name="label")
+        renamed_owner = fields.Relationship(name="owner")
+
+    resource = {
+        "id": "1",
+        "attributes": {"renamed": "a"},
+        "relationships": {"renamed_owner": {"data": {"id": "2", "type": "users"}}},
+    }
+    record = Renamed._meta.deserialize(resource)
+    expected = Renamed(pk=1, renamed="a", renamed_owner={"id": "2", "type": "users"})
+    assert record.__dict__ == expected.__dict__
+    assert record.renamed == "a"
+    assert record.owner_identifier == {"id": "2", "type": "users"}
@@ -1,12 +1,22 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
 from unittest import mock
+from uuid import UUID
+
+import pytest
 
 from django_json_api.fields import (
     Attribute,
     AttributeDescriptor,
+    DateAttribute,
     DateTimeAttribute,
+    DecimalAttribute,
+    EnumAttribute,
+    IntegerAttribute,
     Relationship,
     RelationshipDescriptor,
+    UUIDAttribute,
     get_model,
     is_identifier,
 )
@@ -54,6 +64,65 @@ def test_datetime_attribute_clean():
     assert attribute.clean(42) is None
 
 
+def test_datetime_attribute_clean_fast_path():
+    attribute = DateTimeAttribute()
+    with mock.patch("django_json_api.fields.parse") as parse:
+        assert attribute.clean("2020-02-15T01:23:45.123456Z") == datetime(
+            2020, 2, 15, 1, 23, 45, 123456, tzinfo=timezone.utc
+        )
+        assert attribute.clean("2020-02-15T01:23:45.123+01:00") == datetime(
+            2020, 2, 15, 0, 23, 45, 123000, tzinfo=timezone.utc
+        )
+        assert attribute.clean("2020-02-15T01:23:45") == datetime(2020, 2, 15, 1, 23, 45)
+        parse.assert_not_called()
+    assert attribute.clean("February 15th 2020, 01:23:45 UTC") == datetime(
+        2020, 2, 15, 1, 23, 45, tzinfo=timezone.utc
+    )
+
+
+def test_date_attribute_clean():
+    attribute = DateAttribute()
+    assert attribute.clean("2020-02-15") == date(2020, 2, 15)
+    assert attribute.clean("15 February 2020") == date(2020, 2, 15)
+    assert attribute.clean(None) is None
+
+
+def test_integer_attribute_clean():
+    attribute = IntegerAttribute()
+    assert attribute.clean(12) == 12
+    assert attribute.clean("12") == 12
+    assert attribute.clean(12.0) == 12
+    assert attribute.clean(None) is None
+
+
+def test_decimal_attribute_clean():
+    attribute = DecimalAttribute(max_digits=5, decimal_places=2)
+    assert attribute.clean(0.1) == Decimal("0.1")
+    assert attribute.clean("12.50") == Decimal("12.50")
+    assert attribute.clean(12) == Decimal(12)
+    assert attribute.clean(None) is None
+
+
+def test_uuid_attribute_clean():
+    attribute = UUIDAttribute()
+    value = "12345678-1234-5678-1234-567812345678"
+    assert attribute.clean(value) == UUID(value)
+    assert attribute.clean(None) is None
+
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+def test_enum_attribute_clean():
+    attribute = EnumAttribute(Color)
+    assert attribute.clean("red") is Color.RED
+    assert attribute.clean(None) is None
+    with pytest.raises(ValueError):
+        attribute.clean("green")
+
+
 def test_relationship_contribute_to_class():
     relation = Relationship()
     relation.contribute_to_class(EmptyClass, "relation")
@@ -166,9 +235,19 @@ def test_relationship_descriptor_many_get():
     relation.contribute_to_class(EmptyClass, "relation")
     with mock.patch("django_json_api.fields.get_model") as get_model:
         instance = EmptyClass()
-        instance.relation_identifiers = [{"id": "42", "type": "tests"}]
-        assert instance.relation == [get_model.return_value.objects.get.return_value]
-        get_model.assert_called_once_with("tests")
-        get_model.return_value.objects.get.assert_called_once_with(pk="42")
+        instance.relation_identifiers = [
+            {"id": "42", "type": "tests"},
+            {"id": "137", "type": "tests"},
+            {"id": "12", "type": "tests"},
+        ]
+        get_model.return_value.get_many.return_value = {42: "Record 42", 12: "Record 12"}
+        assert instance.relation == [
+            "Record 42",
+            get_model.return_value.objects.get.return_value,
+            "Record 12",
+        ]
+        get_model.assert_called_with("tests")
+        get_model.return_value.get_many.assert_called_once_with(["42", "137", "12"])
+        get_model.return_value.objects.get.assert_called_once_with(pk="137")
         assert hasattr(instance, "_relation_cache")
     delattr(EmptyClass, "relation")
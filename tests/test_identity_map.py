@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.core.cache import cache
+
+from django_json_api.identity_map import IdentityMapMiddleware, get_identity_map, use_identity_map
+from django_json_api.models import JSONAPIModel
+from tests.models import Dummy
+
+
+def test_use_identity_map():
+    assert get_identity_map() is None
+    with use_identity_map() as identity_map:
+        assert get_identity_map() is identity_map
+        with use_identity_map() as nested:
+            assert nested is identity_map
+        assert get_identity_map() is identity_map
+    assert get_identity_map() is None
+
+
+def test_from_cache_returns_same_instance():
+    cache.clear()
+    Dummy(pk=12, field="Cached").cache()
+    assert Dummy.from_cache(12) is not Dummy.from_cache(12)
+    with use_identity_map() as identity_map:
+        record = Dummy.from_cache(12)
+        assert identity_map == {("tests", 12): record}
+        cache.clear()
+        assert Dummy.from_cache("12") is record
+        assert Dummy.objects.get(pk=12) is record
+        assert Dummy.get_many([12]) == {12: record}
+        assert Dummy.get_many([12])[12] is record
+    cache.clear()
+
+
+def test_get_many_remembers_records():
+    cache.clear()
+    Dummy(pk=12).cache()
+    _manager = Dummy.objects
+    Dummy.objects = mock.Mock()
+    Dummy.objects.get.return_value = Dummy(pk=13)
+    with use_identity_map():
+        records = Dummy.get_many([12, 13])
+        assert Dummy.get_many([12, 13])[12] is records[12]
+        assert Dummy.get_many([12, 13])[13] is records[13]
+        assert Dummy.from_cache(13) is records[13]
+    Dummy.objects.get.assert_called_once_with(pk=13)
+    Dummy.objects = _manager
+    cache.clear()
+
+
+def test_from_resource_updates_remembered_instance():
+    cache.clear()
+    with use_identity_map():
+        record = JSONAPIModel.from_resource(
+            {"id": "12", "type": "tests", "attributes": {"field": "Before"}}
+        )
+        record._related_cache = None
+        (updated,) = JSONAPIModel.from_resources(
+            [{"id": "12", "type": "tests", "attributes": {"field": "After"}}]
+        )
+        assert updated is record
+        assert record.field == "After"
+        assert not hasattr(record, "_related_cache")
+    cache.clear()
+
+
+def test_identity_map_middleware():
+    cache.clear()
+    Dummy(pk=12).cache()
+
+    def view(request):
+        return Dummy.from_cache(12), Dummy.from_cache(12), get_identity_map()
+
+    first, second, identity_map = IdentityMapMiddleware(view)(mock.Mock())
+    assert first is second
+    assert identity_map == {("tests", 12): first}
+    assert get_identity_map() is None
+    assert IdentityMapMiddleware(view)(mock.Mock())[0] is not first
+    cache.clear()
+
+
+def test_remember_updates_compact_records():
+    with use_identity_map():
+        record = JSONAPIModel.from_resource(
+            {"id": "12", "type": "compact_tests", "attributes": {"name": "Stale"}}, persist=False
+        )
+        fresh = JSONAPIModel.from_resource(
+            {"id": "12", "type": "compact_tests", "attributes": {"name": "Fresh"}}, persist=False
+        )
+        assert fresh is record
+        assert record.name == "Fresh"
@@ -1,11 +1,19 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 from urllib.parse import urlencode
 
 import pytest
+import requests_mock
 from django.core.cache import cache
 from requests_mock.mocker import Mocker
 
+from django_json_api.client import JSONAPIClientError, close_async_sessions, get_async_session
 from django_json_api.manager import JSONAPIManager
 from tests.models import Dummy
+from tests.utils import mock_async_transport
 
 PAGES = [
     {
@@ -245,3 +253,516 @@ def test_jsonapi_manager_get():
         # Ignore cache
         assert manager.get(pk=12, ignore_cache=True) == record
         assert mocker.called
+
+
+def page_url(page_number):
+    params = {
+        "include": "related",
+        "fields[tests]": "field,related",
+        "page[size]": 10,
+        "page[number]": page_number,
+    }
+    return f"http://test/api/tests/?{urlencode(params)}"
+
+
+async def collect(iterator):
+    return [record async for record in iterator]
+
+
+def test_jsonapi_manager_aiterator():
+    documents = {page_url(i + 1): page for i, page in enumerate(PAGES)}
+    with mock_async_transport(documents) as requested:
+        records = asyncio.run(collect(JSONAPIManager(Dummy).aiterator()))
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert len(requested) == 5
+
+
+def test_jsonapi_manager_aall():
+    documents = {page_url(i + 1): page for i, page in enumerate(PAGES)}
+    manager = JSONAPIManager(Dummy)
+    with mock_async_transport(documents) as requested:
+        records = asyncio.run(manager.aall())
+        assert len(records) == 50
+        assert asyncio.run(manager.aall()) is records
+    assert len(requested) == 5
+
+
+def test_jsonapi_manager_acount():
+    params = {
+        "page[size]": 1,
+        "filter[key]": "value",
+    }
+    url = f"http://test/api/tests/?{urlencode(params)}"
+    with mock_async_transport({url: {"meta": {"record_count": 137}}}):
+        assert asyncio.run(JSONAPIManager(Dummy).filter(key="value").acount()) == 137
+
+
+def test_jsonapi_manager_async_calls_share_a_session():
+    url = f"http://test/api/tests/?{urlencode({'page[size]': 1})}"
+
+    async def count_twice():
+        manager = JSONAPIManager(Dummy)
+        session = get_async_session("http://test/api")
+        with mock.patch.object(session, "get", wraps=session.get) as get:
+            assert await manager.acount() == 137
+            assert await manager.acount() == 137
+        assert get.call_count == 2
+        assert not session.is_closed
+        await close_async_sessions()
+
+    with mock_async_transport({url: {"meta": {"record_count": 137}}}) as requested:
+        asyncio.run(count_twice())
+    assert len(requested) == 2
+
+
+def test_jsonapi_manager_aget():
+    cache.clear()
+    document = {
+        "data": {"id": "12", "type": "tests", "attributes": {}},
+        "included": [
+            {
+                "id": "137",
+                "type": "tests",
+                "attributes": {"field": "Included Record"},
+            }
+        ],
+    }
+    params = {
+        "fields[tests]": "field,related",
+        "include": "related",
+    }
+    url = f"http://test/api/tests/12/?{urlencode(params)}"
+    manager = JSONAPIManager(Dummy)
+    with mock_async_transport({url: document}) as requested:
+        record = asyncio.run(manager.aget(pk=12))
+        assert record.id == 12
+        assert cache.get("jsonapi:tests:137").field == "Included Record"
+        assert asyncio.run(manager.aget(pk=12)) == record
+        assert requested == [url]
+        assert asyncio.run(manager.aget(pk=12, ignore_cache=True)) == record
+        assert len(requested) == 2
+
+
+@pytest.fixture
+def page_workers():
+    with mock.patch.object(Dummy._meta, "page_workers", 3, create=True):
+        yield
+
+
+@pytest.fixture
+def parallel_pages(pages, page_workers):
+    for i, page in enumerate(PAGES):
+        params = {
+            "include": "related",
+            "fields[tests]": "field,related",
+            "page[size]": 10,
+            "page[number]": i + 1,
+        }
+        pages.register_uri(
+            "GET",
+            f"http://test/api/tests/?{urlencode(params)}",
+            status_code=200,
+            json={**page, "meta": {"record_count": 50}},
+        )
+    yield pages
+
+
+def test_jsonapi_manager_iterator_parallel_pages(parallel_pages):
+    records = list(JSONAPIManager(Dummy).iterator())
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert parallel_pages.call_count == 5
+    first, *others = parallel_pages.request_history
+    assert "X-No-Count" not in first.headers
+    assert all(request.headers["X-No-Count"] == "true" for request in others)
+
+
+def test_jsonapi_manager_iterator_parallel_pages_stops_early(parallel_pages):
+    iterator = JSONAPIManager(Dummy).iterator()
+    assert [next(iterator).id for _ in range(12)] == list(range(1, 13))
+    iterator.close()
+    assert parallel_pages.call_count <= 5
+
+
+def test_jsonapi_manager_iterator_parallel_pages_without_count(pages, page_workers):
+    records = list(JSONAPIManager(Dummy).iterator())
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert pages.call_count == 5
+
+
+def test_jsonapi_manager_iterator_parallel_pages_capped_page_size(page_workers):
+    # The server serves 5 records per page whatever page[size] is requested
+    records = [{"id": str(i), "type": "tests", "attributes": {}} for i in range(1, 21)]
+
+    def capped_page(request, context):
+        page_number = int(request.qs["page[number]"][0])
+        return {
+            "data": records[(page_number - 1) * 5 : page_number * 5],
+            "meta": {"record_count": 20},
+            "links": {"next": "http://next" if page_number < 4 else None},
+        }
+
+    with Mocker() as mocker:
+        mocker.get(requests_mock.ANY, json=capped_page)
+        assert [record.pk for record in JSONAPIManager(Dummy).iterator()] == list(range(1, 21))
+    assert mocker.call_count == 4
+
+
+def test_jsonapi_manager_get_page_count():
+    manager = JSONAPIManager(Dummy)
+    full = {"data": PAGES[0]["data"], "links": {"next": "http://next"}}
+    assert manager._get_page_count({**full, "meta": {"record_count": 41}}) == 5
+    assert manager._get_page_count({"meta": {"record_count": 0}, "data": []}) == 1
+    capped = {"data": PAGES[0]["data"][:5], "links": {"next": "http://next"}}
+    assert manager._get_page_count({**capped, "meta": {"record_count": 41}}) is None
+    assert manager._get_page_count({"meta": {"pagination": {"pages": 7}}}) == 7
+    last = "http://test/api/tests/?page%5Bnumber%5D=12&page%5Bsize%5D=10"
+    assert manager._get_page_count({"links": {"last": last}}) == 12
+    assert manager._get_page_count({"links": {"last": None}}) is None
+
+
+def test_jsonapi_manager_iterator_read_ahead(pages):
+    records = list(JSONAPIManager(Dummy).iterator(read_ahead=2))
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert pages.call_count == 5
+
+
+def test_jsonapi_manager_iterator_read_ahead_from_meta(pages):
+    with mock.patch.object(Dummy._meta, "read_ahead", 1, create=True):
+        records = list(JSONAPIManager(Dummy).iterator())
+    assert len(records) == 50
+
+
+def test_jsonapi_manager_iterator_read_ahead_is_bounded():
+    depth = 1
+    requested = []
+    buffer_full = threading.Event()
+
+    def serve(request, context):
+        requested.append(request.url)
+        # One page being consumed, one buffered and one waiting for room in the buffer
+        if len(requested) == depth + 2:
+            buffer_full.set()
+        return PAGES[int(request.qs["page[number]"][0]) - 1]
+
+    with Mocker() as mocker:
+        mocker.get(requests_mock.ANY, json=serve)
+        iterator = JSONAPIManager(Dummy).iterator(read_ahead=depth)
+        assert next(iterator).id == 1
+        assert buffer_full.wait(5)
+        # Leaves the producer a chance to overrun the buffer, were it not bounded
+        time.sleep(0.1)
+        assert len(requested) <= depth + 2
+        iterator.close()
+
+
+def test_jsonapi_manager_iterator_read_ahead_raises_errors():
+    with Mocker() as mocker:
+        mocker.register_uri("GET", requests_mock.ANY, status_code=500)
+        with pytest.raises(JSONAPIClientError):
+            list(JSONAPIManager(Dummy).iterator(read_ahead=2))
+
+
+@pytest.fixture
+def stream_pages():
+    with mock.patch.object(Dummy._meta, "stream_pages", True, create=True):
+        yield
+
+
+def test_jsonapi_manager_iterator_stream_pages(pages, stream_pages):
+    cache.clear()
+    with mock.patch("django_json_api.caching.cache.set_many", wraps=cache.set_many) as set_many:
+        records = list(JSONAPIManager(Dummy).iterator())
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert pages.call_count == 5
+    assert cache.get("jsonapi:tests:50") == records[-1]
+    # One write per page of 10 records
+    assert set_many.call_count == 5
+
+
+def test_jsonapi_manager_iterator_stream_pages_in_batches(pages, stream_pages):
+    cache.clear()
+    with mock.patch.object(Dummy._meta, "stream_batch_size", 4, create=True):
+        with mock.patch("django_json_api.caching.cache.set_many", wraps=cache.set_many) as set_many:
+            iterator = JSONAPIManager(Dummy).iterator()
+            assert [next(iterator).id for _ in range(4)] == [1, 2, 3, 4]
+            assert set_many.call_count == 1
+            records = [*range(4), *iterator]
+    assert len(records) == 50
+    # Batches of 4, 4 and 2 records per page of 10
+    assert set_many.call_count == 15
+
+
+def test_jsonapi_manager_iterator_stream_pages_caches_included_first(stream_pages):
+    cache.clear()
+    related = {"data": {"id": "137", "type": "tests"}}
+    page = {
+        "data": [
+            {"id": str(i), "type": "tests", "relationships": {"related": related}}
+            for i in range(1, 21)
+        ],
+        "included": [{"id": "137", "type": "tests", "attributes": {"field": "Included"}}],
+        "links": {"next": None},
+    }
+    with mock.patch.object(Dummy._meta, "stream_batch_size", 4, create=True), Mocker() as mocker:
+        mocker.get(requests_mock.ANY, json=page)
+        iterator = JSONAPIManager(Dummy).iterator()
+        record = next(iterator)
+        assert cache.get("jsonapi:tests:137").field == "Included"
+        assert record.related.field == "Included"
+        assert [record.pk for record in iterator] == list(range(2, 21))
+    assert mocker.call_count == 1
+
+
+@pytest.fixture
+def batched_dummy():
+    cache.clear()
+    with mock.patch.object(Dummy._meta, "batch_window", 0.1, create=True), mock.patch.object(
+        Dummy._meta, "many_id_lookup", "id", create=True
+    ), Mocker() as mocker:
+
+        def filtered_page(request, context):
+            ids = request.qs["filter[id]"][0].split(",")
+            return {
+                "data": [{"id": pk, "type": "tests", "attributes": {}} for pk in ids if pk != "4"],
+                "links": {"next": None},
+            }
+
+        mocker.get(requests_mock.ANY, json=filtered_page)
+        mocker.get(
+            "http://test/api/tests/4/",
+            json={"data": {"id": "4", "type": "tests", "attributes": {}}},
+        )
+        yield mocker
+    cache.clear()
+
+
+def test_jsonapi_manager_get_batches_concurrent_calls(batched_dummy):
+    manager = JSONAPIManager(Dummy)
+    with mock.patch.object(Dummy._meta, "batch_window", 5):
+        batch_loader = manager.batch_loader
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # Stands for a get() call in flight, which the batch waits for
+            with batch_loader.expect():
+                futures = [executor.submit(manager.get, pk) for pk in [1, 2, "3", 3]]
+                deadline = time.monotonic() + 5
+                while len(batch_loader._pending) < 3 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                assert not batched_dummy.called
+            records = [future.result() for future in futures]
+    assert [record.pk for record in records] == [1, 2, 3, 3]
+    assert batched_dummy.call_count == 1
+    assert sorted(batched_dummy.last_request.qs["filter[id]"][0].split(",")) == ["1", "2", "3"]
+    assert cache.get("jsonapi:tests:2") == records[1]
+
+
+def test_jsonapi_manager_get_sequential_calls_are_not_delayed(batched_dummy):
+    manager = JSONAPIManager(Dummy)
+    with mock.patch.object(Dummy._meta, "batch_window", 5):
+        started = time.monotonic()
+        assert [manager.get(pk).pk for pk in [1, 2, 3]] == [1, 2, 3]
+        assert time.monotonic() - started < 1
+    assert batched_dummy.call_count == 3
+
+
+def test_jsonapi_manager_get_batch_falls_back_for_missing_records(batched_dummy):
+    assert JSONAPIManager(Dummy).get(4).pk == 4
+    assert batched_dummy.call_count == 2
+
+
+def test_jsonapi_manager_batch_loader_requires_many_id_lookup():
+    with mock.patch.object(Dummy._meta, "batch_window", 0.1, create=True):
+        assert JSONAPIManager(Dummy).batch_loader is None
+
+
+def test_jsonapi_manager_iterator_deadline(pages):
+    Dummy._meta.iteration_deadline = 0
+    with pytest.raises(JSONAPIClientError, match="Deadline exceeded"):
+        list(JSONAPIManager(Dummy).iterator())
+    delattr(Dummy._meta, "iteration_deadline")
+    assert not pages.called
+
+
+def cursor_page(j, relative=False):
+    page = PAGES[j]
+    next_url = None
+    if j < 4:
+        next_url = f"?page%5Bcursor%5D=c{j + 1}&page%5Bsize%5D=10"
+        if not relative:
+            next_url = f"http://test/api/tests/{next_url}"
+    return {**page, "links": {"next": next_url}}
+
+
+@pytest.fixture
+def cursor_pages():
+    with Mocker() as mocker:
+        params = {
+            "include": "related",
+            "fields[tests]": "field,related",
+            "page[size]": 10,
+        }
+        first_page_url = f"http://test/api/tests/?{urlencode(params)}"
+        mocker.get(first_page_url, json=cursor_page(0))
+        mocker.get(f"{first_page_url}&page%5Bnumber%5D=1", json=cursor_page(0, relative=True))
+        for j in range(1, 5):
+            mocker.get(
+                f"http://test/api/tests/?page%5Bcursor%5D=c{j}&page%5Bsize%5D=10",
+                json=cursor_page(j, relative=j % 2),
+            )
+        yield mocker
+
+
+def test_jsonapi_manager_get_cursor_url():
+    manager = JSONAPIManager(Dummy)
+    assert manager._get_cursor_url(None) is None
+    assert manager._get_cursor_url("http://test/api/tests/?page%5Bnumber%5D=2") is None
+    assert manager._get_cursor_url("?page%5Bcursor%5D=abc") == "?page%5Bcursor%5D=abc"
+    assert manager._get_cursor_url("?page%5Bafter%5D=abc") == "?page%5Bafter%5D=abc"
+    with mock.patch.object(Dummy._meta, "pagination", "cursor", create=True):
+        assert manager._get_cursor_url("http://next") == "http://next"
+    with mock.patch.object(Dummy._meta, "pagination", "number", create=True):
+        assert manager._get_cursor_url("?page%5Bcursor%5D=abc") is None
+
+
+def test_jsonapi_manager_iterator_follows_cursor_links(cursor_pages):
+    records = list(JSONAPIManager(Dummy).iterator())
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert cursor_pages.call_count == 5
+    assert "page%5Bnumber%5D=1" in cursor_pages.request_history[0].url
+    assert all("number" not in request.url for request in cursor_pages.request_history[1:])
+
+
+def test_jsonapi_manager_iterator_cursor_pagination(cursor_pages):
+    with mock.patch.object(Dummy._meta, "pagination", "cursor", create=True):
+        records = list(JSONAPIManager(Dummy).iterator())
+        assert len(records) == 50
+        assert "page%5Bnumber%5D" not in cursor_pages.request_history[0].url
+        with mock.patch.object(Dummy._meta, "stream_pages", True, create=True):
+            records = list(JSONAPIManager(Dummy).iterator())
+            assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert cursor_pages.call_count == 10
+
+
+def test_jsonapi_manager_iterator_refuses_foreign_links(cursor_pages):
+    page = {**PAGES[1], "links": {"next": "https://evil.example/tests/?page%5Bcursor%5D=c2"}}
+    cursor_pages.get("http://test/api/tests/?page%5Bcursor%5D=c1&page%5Bsize%5D=10", json=page)
+    iterator = JSONAPIManager(Dummy).iterator()
+    assert len([next(iterator) for _ in range(20)]) == 20
+    with pytest.raises(JSONAPIClientError, match="evil.example"):
+        next(iterator)
+    assert all("evil" not in request.url for request in cursor_pages.request_history)
+
+
+def test_jsonapi_manager_aiterator_follows_cursor_links():
+    params = {
+        "include": "related",
+        "fields[tests]": "field,related",
+        "page[size]": 10,
+        "page[number]": 1,
+    }
+    documents = {f"http://test/api/tests/?{urlencode(params)}": cursor_page(0, relative=True)}
+    for j in range(1, 5):
+        url = f"http://test/api/tests/?page%5Bcursor%5D=c{j}&page%5Bsize%5D=10"
+        documents[url] = cursor_page(j)
+    with mock_async_transport(documents) as requested:
+        records = asyncio.run(collect(JSONAPIManager(Dummy).aiterator()))
+    assert list(map(lambda x: x.id, records)) == list(range(1, 51))
+    assert len(requested) == 5
+
+
+@pytest.fixture
+def negative_cache():
+    cache.clear()
+    Dummy._meta.negative_cache_expiration = 60
+    yield
+    delattr(Dummy._meta, "negative_cache_expiration")
+    cache.clear()
+
+
+def test_jsonapi_manager_get_caches_not_found(negative_cache):
+    with Mocker() as mocker:
+        mocker.register_uri("GET", requests_mock.ANY, status_code=404, json={"errors": []})
+        with pytest.raises(JSONAPIClientError) as error:
+            Dummy.objects.get(pk=12)
+        assert error.value.response.status_code == 404
+        assert Dummy.from_cache(12) is None
+        mocker.reset_mock()
+        with pytest.raises(JSONAPIClientError) as error:
+            Dummy.objects.get(pk=12)
+        assert error.value.response.status_code == 404
+        assert not mocker.called
+        with pytest.raises(JSONAPIClientError):
+            Dummy.objects.get(pk=12, ignore_cache=True)
+        assert mocker.called
+
+
+def test_jsonapi_manager_get_not_found_without_negative_cache():
+    cache.clear()
+    with Mocker() as mocker:
+        mocker.register_uri("GET", requests_mock.ANY, status_code=404, json={"errors": []})
+        for _ in range(2):
+            with pytest.raises(JSONAPIClientError):
+                Dummy.objects.get(pk=12)
+        assert mocker.call_count == 2
+
+
+def test_jsonapi_manager_aget_caches_not_found(negative_cache):
+    with mock_async_transport({}) as requested:
+        for _ in range(2):
+            with pytest.raises(JSONAPIClientError) as error:
+                asyncio.run(Dummy.objects.aget(pk=12))
+            assert error.value.response.status_code == 404
+    assert len(requested) == 1
+
+
+@pytest.fixture
+def cache_lock_timeout():
+    cache.clear()
+    Dummy._meta.cache_lock_timeout = 1
+    yield
+    delattr(Dummy._meta, "cache_lock_timeout")
+    cache.clear()
+
+
+def test_jsonapi_manager_get_waits_for_lock_holder(cache_lock_timeout):
+    cache.add("jsonapi:tests:12:lock", True)
+
+    def fetch_elsewhere():
+        time.sleep(0.1)
+        Dummy(pk=12, field="Cached Elsewhere").cache()
+        cache.delete("jsonapi:tests:12:lock")
+
+    with Mocker() as mocker, ThreadPoolExecutor() as executor:
+        executor.submit(fetch_elsewhere)
+        assert Dummy.objects.get(pk=12).field == "Cached Elsewhere"
+        assert not mocker.called
+
+
+def test_jsonapi_manager_get_fetches_after_lock_timeout(cache_lock_timeout):
+    Dummy._meta.cache_lock_timeout = 0.1
+    cache.add("jsonapi:tests:12:lock", True, 10)
+    with Mocker() as mocker:
+        mocker.register_uri("GET", requests_mock.ANY, json={"data": {"id": "12", "type": "tests"}})
+        assert Dummy.objects.get(pk=12) == Dummy(pk=12)
+        assert mocker.call_count == 1
+        mocker.reset_mock()
+        cache.delete("jsonapi:tests:12:lock")
+        cache.delete("jsonapi:tests:12")
+        assert Dummy.objects.get(pk=12) == Dummy(pk=12)
+        assert mocker.call_count == 1
+    assert cache.get("jsonapi:tests:12:lock") is None
+
+
+def test_jsonapi_manager_aget_waits_for_lock_holder(cache_lock_timeout):
+    cache.add("jsonapi:tests:12:lock", True)
+
+    async def fetch_elsewhere():
+        await asyncio.sleep(0.1)
+        Dummy(pk=12, field="Cached Elsewhere").cache()
+        cache.delete("jsonapi:tests:12:lock")
+
+    async def get():
+        return (await asyncio.gather(Dummy.objects.aget(pk=12), fetch_elsewhere()))[0]
+
+    with mock_async_transport({}) as requested:
+        assert asyncio.run(get()).field == "Cached Elsewhere"
+    assert requested == []
@@ -1,9 +1,17 @@
+import asyncio
+import pickle
+import sys
+import threading
+import time
 from unittest import TestCase, mock
 
 from django.core.cache import cache
 
-from django_json_api.models import JSONAPIModel
-from tests.models import Dummy
+from django_json_api import fields
+from django_json_api.caching import cache_get_many
+from django_json_api.manager import JSONAPIManager
+from django_json_api.models import JSONAPIModel, chunk_ids
+from tests.models import CompactDummy, Dummy, DummyRelated
 
 
 class JSONAPIModelBaseTestCase(TestCase):
@@ -24,6 +32,13 @@ class JSONAPIModelBaseTestCase(TestCase):
         self.assertEqual(empty, empty)
         self.assertNotEqual(empty, Dummy())
 
+    def test_hash(self):
+        self.assertEqual(hash(Dummy(pk=12)), hash(Dummy(pk="12", field="test")))
+        self.assertEqual(len({Dummy(pk=12), Dummy(pk=12), Dummy(pk=13)}), 2)
+        self.assertNotIn(DummyRelated(pk=12), {Dummy(pk=12)})
+        with self.assertRaises(TypeError):
+            hash(Dummy())
+
     def test_init(self):
         model = Dummy(pk="12", field="test", related={"id": "12", "type": "tests"})
         self.assertEqual(model.id, 12)
@@ -71,6 +86,64 @@ class JSONAPIModelBaseTestCase(TestCase):
         Dummy.objects = _manager
         delattr(Dummy._meta, "many_id_lookup")
 
+    def test_get_many_caches_not_found(self):
+        _manager = Dummy.objects
+        Dummy.objects = mock.Mock()
+        Dummy.objects.filter.return_value = [Dummy(pk=12)]
+        Dummy._meta.many_id_lookup = "id"
+        Dummy._meta.negative_cache_expiration = 60
+        self.assertEqual(list(Dummy.get_many([12, 137])), [12])
+        self.assertIsNone(Dummy.from_cache(137))
+        Dummy.objects.filter.reset_mock()
+        Dummy(pk=12).cache()
+        self.assertEqual(list(Dummy.get_many([12, 137])), [12])
+        Dummy.objects.filter.assert_not_called()
+        Dummy.objects = _manager
+        delattr(Dummy._meta, "many_id_lookup")
+        delattr(Dummy._meta, "negative_cache_expiration")
+
+    def test_get_many_chunks_ids(self):
+        _manager = Dummy.objects
+        Dummy.objects = mock.Mock()
+        Dummy.objects.filter.side_effect = lambda id: [Dummy(pk=pk) for pk in id.split(",")]
+        Dummy._meta.many_id_lookup = "id"
+        Dummy._meta.many_id_max_count = 2
+        records = Dummy.get_many([1, 2, 3, 4, 5])
+        self.assertEqual(sorted(records), [1, 2, 3, 4, 5])
+        self.assertEqual(
+            sorted(call.kwargs["id"] for call in Dummy.objects.filter.call_args_list),
+            ["1,2", "3,4", "5"],
+        )
+        # URL length
+        Dummy.objects.filter.reset_mock()
+        delattr(Dummy._meta, "many_id_max_count")
+        base_length = len(JSONAPIManager(Dummy).filter(id="").build_url())
+        Dummy._meta.max_url_length = base_length + len("1000%2C1001")
+        records = Dummy.get_many([1000, 1001, 1002])
+        self.assertEqual(sorted(records), [1000, 1001, 1002])
+        self.assertEqual(
+            sorted(call.kwargs["id"] for call in Dummy.objects.filter.call_args_list),
+            ["1000,1001", "1002"],
+        )
+        Dummy.objects = _manager
+        delattr(Dummy._meta, "many_id_lookup")
+        delattr(Dummy._meta, "max_url_length")
+
+    def test_get_many_fetches_concurrently(self):
+        _manager = Dummy.objects
+        Dummy.objects = mock.Mock()
+        threads = set()
+
+        def get(pk):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return Dummy(pk=pk)
+
+        Dummy.objects.get.side_effect = get
+        self.assertEqual(sorted(Dummy.get_many([1, 2, 3, 4])), [1, 2, 3, 4])
+        self.assertGreater(len(threads), 1)
+        Dummy.objects = _manager
+
     def test_refresh_from_api(self):
         _manager = Dummy.objects
         Dummy.objects = mock.Mock()
@@ -121,3 +194,147 @@ class JSONAPIModelBaseTestCase(TestCase):
         record = JSONAPIModel.from_resource(resource)
         self.assertIsInstance(record, Dummy)
         self.assertEqual(record.id, 137)
+
+    def test_from_resources_reads_cache_once_per_type(self):
+        Dummy(pk=1, related={"id": "10", "type": "tests"}).cache()
+        Dummy(pk=2, related={"id": "20", "type": "tests"}).cache()
+        resources = [
+            {"type": "tests", "id": "1", "attributes": {"field": "One"}},
+            {"type": "tests", "id": "2", "attributes": {"field": "Two"}},
+            {"type": "tests", "id": "3", "attributes": {"field": "Three"}},
+            {
+                "type": "tests",
+                "id": "4",
+                "relationships": {"related": {"data": {"id": "40", "type": "tests"}}},
+            },
+        ]
+        with mock.patch("django_json_api.models.cache_get_many", wraps=cache_get_many) as get:
+            records = JSONAPIModel.from_resources(resources)
+            get.assert_called_once_with(Dummy, {Dummy.cache_key(pk): pk for pk in (1, 2, 3)})
+            self.assertEqual(
+                [record.related_identifier for record in records[:2]],
+                [{"id": "10", "type": "tests"}, {"id": "20", "type": "tests"}],
+            )
+            self.assertFalse(hasattr(records[2], "related_identifier"))
+            self.assertEqual(records[3].related_identifier, {"id": "40", "type": "tests"})
+            get.reset_mock()
+            JSONAPIModel.from_resource(resources[3])
+            get.assert_not_called()
+        self.assertEqual(Dummy.from_cache(1).field, "One")
+
+    def test_aget_many(self):
+        _manager = Dummy.objects
+        cached_instance = Dummy(pk=12)
+        cache.set(Dummy.cache_key(cached_instance.pk), cached_instance)
+        non_cached_instances = {137: Dummy(pk=137), 138: Dummy(pk=138)}
+        Dummy.objects = mock.Mock()
+
+        async def aget(pk, client=None):
+            self.assertIsNotNone(client)
+            return non_cached_instances[pk]
+
+        Dummy.objects.aget.side_effect = aget
+        self.assertEqual(
+            {12: cached_instance, **non_cached_instances},
+            asyncio.run(Dummy.aget_many([12, 137, 138])),
+        )
+        self.assertEqual(Dummy.objects.aget.call_count, 2)
+        Dummy.objects = _manager
+
+
+def test_chunk_ids():
+    assert list(chunk_ids([1, 22, 333], base_length=10, max_length=100)) == [[1, 22, 333]]
+    assert list(chunk_ids([1, 22, 333], base_length=10, max_length=100, max_count=2)) == [
+        [1, 22],
+        [333],
+    ]
+    # 10 + len("1%2C22") == 16
+    assert list(chunk_ids([1, 22, 333], base_length=10, max_length=16)) == [[1, 22], [333]]
+    # An id longer than the budget still gets its own chunk
+    assert list(chunk_ids([1, 22, 333], base_length=10, max_length=11)) == [[1], [22], [333]]
+    assert list(chunk_ids([], base_length=10, max_length=11)) == []
+
+
+def test_compact_model_storage():
+    record = CompactDummy(
+        pk=12,
+        name="Name",
+        renamed="Label",
+        owner={"id": "13", "type": "tests"},
+        members=[Dummy(pk=14)],
+    )
+    assert not hasattr(record, "__dict__")
+    assert record._owner_ids == ("tests", 13)
+    assert record._members_ids == (("tests", 14),)
+    assert record.owner_identifier == {"id": "13", "type": "tests"}
+    assert record.members_identifiers == [{"id": "14", "type": "tests"}]
+    assert record.renamed == "Label"
+    assert CompactDummy(pk=13).name is None
+    assert not hasattr(CompactDummy(pk=13), "owner_identifier")
+
+
+def test_compact_model_deserialize():
+    resource = {
+        "id": "12",
+        "type": "compact_tests",
+        "attributes": {"name": "Name", "renamed": "Label"},
+        "relationships": {"owner": {"data": {"id": "13", "type": "tests"}}, "members": {}},
+    }
+    existing = CompactDummy(pk=12, members=[{"id": "14", "type": "tests"}])
+    record = CompactDummy._meta.deserialize(resource, existing)
+    assert record._get_state() == {
+        "pk": 12,
+        "name": "Name",
+        "label": "Label",
+        "owner_identifier": {"id": "13", "type": "tests"},
+        "members_identifiers": [{"id": "14", "type": "tests"}],
+    }
+    assert record._owner_ids[0] is sys.intern("tests")
+
+
+def test_compact_model_pickle_and_cache():
+    cache.clear()
+    record = CompactDummy(pk=12, name="Name", owner=None)
+    record._owner_cache = None
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored._get_state() == {"pk": 12, "name": "Name", "owner_identifier": None}
+    record.cache()
+    assert CompactDummy.from_cache(12)._get_state() == restored._get_state()
+    CompactDummy._meta.cache_format = "compact"
+    try:
+        record.cache()
+        assert CompactDummy.from_cache(12)._get_state() == restored._get_state()
+    finally:
+        delattr(CompactDummy._meta, "cache_format")
+        cache.clear()
+
+
+def test_compact_model_refresh_from_api():
+    record = CompactDummy(pk=12, name="Stale", owner={"id": "13", "type": "tests"})
+    fresh = CompactDummy(pk=12, name="Fresh")
+    with mock.patch.object(CompactDummy, "objects") as objects:
+        objects.get.return_value = fresh
+        record.refresh_from_api()
+    assert record.name == "Fresh"
+    assert not hasattr(record, "owner_identifier")
+    cache.clear()
+
+
+def test_compact_model_inheritance():
+    class Base(JSONAPIModel):
+        class Meta:
+            abstract = True
+            compact = True
+
+        name = fields.Attribute()
+
+    class Child(Base):
+        class Meta:
+            api_url = "http://test/api"
+            resource_type = "compact_children"
+
+        other = fields.Attribute()
+
+    assert Child._meta.compact
+    assert Child.__slots__ == ("_other_value",)
+    assert not hasattr(Child(pk=1, name="Name", other="Other"), "__dict__")
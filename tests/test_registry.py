@@ -0,0 +1,59 @@
+import pytest
+
+from django_json_api import fields, models, registry
+from tests.models import Dummy, DummyRelated
+
+
+@pytest.fixture
+def cleanup_registry():
+    registered = dict(registry._models)
+    yield
+    registry._models.clear()
+    registry._models.update(registered)
+
+
+def test_get_model():
+    assert registry.get_model("tests") is Dummy
+    assert registry.get_model("related_records") is DummyRelated
+    assert registry.get_model("unknown") is None
+
+
+def test_register_abstract_and_indirect_subclasses(cleanup_registry):
+    class Base(models.JSONAPIModel):
+        class Meta:
+            abstract = True
+            api_url = "http://abstract/api"
+
+        name = fields.Attribute()
+
+    class Concrete(Base):
+        class Meta(Base.Meta):
+            resource_type = "concretes"
+
+        other = fields.Attribute()
+
+    class Indirect(Concrete):
+        class Meta(Concrete.Meta):
+            resource_type = "indirects"
+
+    assert registry.get_model("concretes") is Concrete
+    assert registry.get_model("indirects") is Indirect
+    assert not hasattr(Base, "objects")
+    assert not Concrete._meta.abstract
+    assert list(Concrete._meta.fields) == ["name", "other"]
+    assert list(Indirect._meta.fields) == ["name", "other"]
+    assert Indirect.objects.model is Indirect
+    assert models.JSONAPIModel.from_resource(
+        {"type": "indirects", "id": "1", "attributes": {"name": "Indirect"}}, persist=False
+    ) == Indirect(pk=1)
+
+
+def test_register_duplicate_resource_type(cleanup_registry):
+    with pytest.raises(RuntimeError, match='Conflicting "tests" models'):
+
+        class Duplicate(models.JSONAPIModel):
+            class Meta:
+                api_url = "http://test/api"
+                resource_type = "tests"
+
+    assert registry.get_model("tests") is Dummy
@@ -1,3 +1,4 @@
+from enum import Enum
 from unittest import mock
 
 from django.test import TestCase
@@ -5,6 +6,7 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import BaseSerializer
 from rest_framework_json_api.utils import get_included_serializers
 
+from django_json_api import fields, models
 from django_json_api.client import JSONAPIClientError
 from django_json_api.rest_framework import ModelSerializer, get_default_relation_serializer
 from tests.models import DummyModel, DummyRelated
@@ -35,6 +37,50 @@ def test_get_default_relation_serializer_limit_fields():
     assert serializer.data == {"id": 42}
 
 
+class Status(Enum):
+    ACTIVE = "active"
+    CLOSED = "closed"
+
+
+class Typed(models.JSONAPIModel):
+    class Meta:
+        api_url = "http://test/api"
+        resource_type = "typed"
+
+    count = fields.IntegerAttribute()
+    price = fields.DecimalAttribute(max_digits=6, decimal_places=2)
+    day = fields.DateAttribute()
+    created_at = fields.DateTimeAttribute()
+    uuid = fields.UUIDAttribute()
+    status = fields.EnumAttribute(Status)
+
+
+def test_get_default_relation_serializer_typed_attributes():
+    serializer_class = get_default_relation_serializer(Typed)
+    record = Typed._meta.deserialize(
+        {
+            "id": "1",
+            "attributes": {
+                "count": "3",
+                "price": 12.5,
+                "day": "2020-02-15",
+                "created_at": "2020-02-15T01:23:45Z",
+                "uuid": "12345678-1234-5678-1234-567812345678",
+                "status": "active",
+            },
+        }
+    )
+    assert serializer_class(record).data == {
+        "id": 1,
+        "count": 3,
+        "price": "12.50",
+        "day": "2020-02-15",
+        "created_at": "2020-02-15T01:23:45",
+        "uuid": "12345678-1234-5678-1234-567812345678",
+        "status": "active",
+    }
+
+
 class JsonAPISerializerTestCase(TestCase):
     def test_serialized_data(self):
         instance = DummyModel(pk=12, related=DummyRelated(pk=42).cache())
@@ -106,6 +152,7 @@ class JsonAPISerializerTestCase(TestCase):
             (KeyError, KeyError),
             (JSONAPIClientError(response=mock.Mock(status_code=500)), JSONAPIClientError),
             (JSONAPIClientError(response=mock.Mock(status_code=404)), ValidationError),
+            (JSONAPIClientError("Request Error"), JSONAPIClientError),
         ]:
             with self.subTest(thrown=thrown, raised=raised):
                 with mock.patch.object(BaseSerializer, "is_valid", side_effect=thrown):
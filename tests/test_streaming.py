@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from django_json_api.streaming import iter_document
+
+DOCUMENT = {
+    "data": [
+        {"id": str(i), "type": "tests", "attributes": {"field": f"Récord #{i}", "score": i / 2}}
+        for i in range(20)
+    ],
+    "included": [{"id": "42", "type": "tests", "attributes": {}}],
+    "links": {"next": None},
+    "meta": {"record_count": 12345},
+}
+
+
+def chunked(raw, size):
+    return [raw[i : i + size] for i in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 1024, 1024 * 1024])
+def test_iter_document(chunk_size):
+    raw = json.dumps(DOCUMENT, indent=2, ensure_ascii=False).encode()
+    events = list(iter_document(chunked(raw, chunk_size)))
+    assert [value for member, value in events if member == "data"] == DOCUMENT["data"]
+    assert [value for member, value in events if member == "included"] == DOCUMENT["included"]
+    assert ("links", {"next": None}) in events
+    assert ("meta", {"record_count": 12345}) in events
+
+
+def test_iter_document_is_incremental():
+    raw = json.dumps(DOCUMENT).encode()
+    consumed = []
+
+    def chunks():
+        for chunk in chunked(raw, 64):
+            consumed.append(chunk)
+            yield chunk
+
+    events = iter_document(chunks())
+    assert next(events) == ("data", DOCUMENT["data"][0])
+    assert len(consumed) < len(raw) / 64 / 4
+
+
+def test_iter_document_single_resource_and_empty_arrays():
+    document = {"data": {"id": "1", "type": "tests"}, "included": []}
+    assert list(iter_document([json.dumps(document).encode()])) == [
+        ("data", {"id": "1", "type": "tests"})
+    ]
+    assert list(iter_document([b"{}"])) == []
+
+
+def test_iter_document_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_document([b'{"data": [{"id": "1"}']))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_document([b'["data"]']))
@@ -0,0 +1,38 @@
+import pytest
+from django.test import override_settings
+
+from django_json_api.client import JSONAPIClient
+from django_json_api.transport import close_adapters, get_adapter
+
+
+@pytest.fixture(autouse=True)
+def adapters():
+    close_adapters()
+    yield
+    close_adapters()
+
+
+def test_get_adapter_is_shared_per_api_url():
+    adapter = get_adapter("http://test/api")
+    assert get_adapter("http://test/api") is adapter
+    assert get_adapter("http://example.com") is not adapter
+
+
+@override_settings(DJANGO_JSON_API_POOL_CONNECTIONS=4, DJANGO_JSON_API_POOL_MAXSIZE=32)
+def test_get_adapter_pool_settings():
+    adapter = get_adapter("http://test/api")
+    assert adapter._pool_connections == 4
+    assert adapter._pool_maxsize == 32
+
+
+def test_clients_share_adapters():
+    first, second = JSONAPIClient(), JSONAPIClient()
+    first._mount_adapter("tests")
+    second._mount_adapter("tests")
+    assert first.session.get_adapter("http://test/api/tests/") is get_adapter("http://test/api")
+    assert second.session.get_adapter("http://test/api/tests/") is get_adapter("http://test/api")
+
+
+@override_settings(DJANGO_JSON_API_KEEP_ALIVE=False)
+def test_keep_alive_disabled():
+    assert JSONAPIClient().session.headers["Connection"] == "close"
@@ -1,5 +1,8 @@
+from contextlib import contextmanager
 from unittest import mock
 
+import httpx
+
 
 def mock_json_api(target):
     target.patcher = mock.patch("django_json_api.manager.JSONAPIManager", spec=True)
@@ -20,3 +23,26 @@ def mock_json_api(target):
     target.tearDown = decorated_teardown
 
     return target
+
+
+@contextmanager
+def mock_async_transport(documents, status_code=200):
+    requested = []
+
+    def normalize(url):
+        url = httpx.URL(url)
+        return url.copy_with(query=None), sorted(url.params.multi_items())
+
+    def handler(request):
+        requested.append(str(request.url))
+        for url, document in documents.items():
+            if normalize(url) == normalize(request.url):
+                return httpx.Response(status_code, json=document)
+        return httpx.Response(404, json={"errors": []})
+
+    transport = httpx.MockTransport(handler)
+    async_client = httpx.AsyncClient
+    with mock.patch(
+        "httpx.AsyncClient", lambda **kwargs: async_client(transport=transport, **kwargs)
+    ):
+        yield requested